@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for LinkEnv
+Measures steps/sec, resets/sec, observation latency and memory use per configuration
+and writes the results as JSON so runs can be compared across commits
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from env.emulator_pool import get_pool, worker_start_method
+from env.link_env import LinkEnv
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def process_memory_mb(pid):
+    """
+    Rss, Pss and Uss of one process in MiB (Linux only). Rss counts shared pages in full in every
+    process; Pss splits them between the processes sharing them and Uss leaves them out, so those
+    two show what each extra worker really costs.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                fields[key] = int(parts[0]) / 1024
+    return {"rss_mb": fields["Rss"], "pss_mb": fields["Pss"],
+            "uss_mb": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def run_isolated(function, *args):
+    """
+    Run function(*args) in a freshly spawned process and return its result, so memory figures are
+    not skewed by what earlier configs allocated (and the allocator kept) in this process
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(function, *args).result()
+
+
+def bench_single(obs_mode, frame_skip, render, steps, resets, seed):
+    """Benchmark one LinkEnv in this process (main runs each config in a fresh one, see run_isolated)"""
+    measure_memory = sys.platform.startswith("linux")
+    if measure_memory:
+        memory_before = process_memory_mb(os.getpid())
+    env = LinkEnv(render=render, obs_mode=obs_mode, frame_skip=frame_skip)
+    actions = np.random.default_rng(seed).integers(env.action_space.n, size=steps)
+
+    start = time.perf_counter()
+    for _ in range(resets):
+        env.reset(seed=seed)
+    reset_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for action in actions:
+        env.step(int(action))
+    step_seconds = time.perf_counter() - start
+
+    # Observation latency on its own, against the final emulator state
+    obs_latencies = np.empty(min(steps, 1000))
+    for i in range(len(obs_latencies)):
+        obs_start = time.perf_counter()
+        env._get_obs()
+        obs_latencies[i] = time.perf_counter() - obs_start
+
+    metrics = {
+        "steps_per_sec": steps / step_seconds,
+        "frames_per_sec": steps * frame_skip / step_seconds,
+        "resets_per_sec": resets / reset_seconds,
+        "obs_latency_us_mean": float(obs_latencies.mean() * 1e6),
+        "obs_latency_us_p99": float(np.percentile(obs_latencies, 99) * 1e6),
+    }
+    if measure_memory:
+        # Current (not peak) memory of this config's own process
+        memory_after = process_memory_mb(os.getpid())
+        metrics["rss_mb"] = memory_after["rss_mb"]
+        metrics["pss_mb_delta"] = memory_after["pss_mb"] - memory_before["pss_mb"]
+    env.close()
+    return metrics
+
+
+def tree_pss_mb(pid=None):
+    """
+    Total Pss of a process and all its descendants (e.g. a forkserver and its workers) in MiB.
+    Pss splits every shared page between the processes mapping it, so the sum over a tree does not
+    change when pages merely move from private to shared; Uss has no such property.
+    """
+    pid = pid or os.getpid()
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid is the second field after the parenthesised command name
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, stack = 0.0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            total += process_memory_mb(current)["pss_mb"]
+        except (OSError, KeyError):
+            continue  # Exited in the meantime
+        stack.extend(children.get(current, []))
+    return total
+
+
+def warm_forkserver():
+    """
+    Start the forkserver and let it finish its preload (SB3, torch, the ROM) by forking one no-op
+    process from it, so that this one-time cost is not charged to whichever config runs first
+    """
+    process = multiprocessing.get_context("forkserver").Process(target=os.getpid)
+    process.start()
+    process.join()
+
+
+def bench_vectorized(n_workers, obs_mode, frame_skip, steps, seed, backend="subproc"):
+    """
+    Benchmark n_workers LinkEnvs behind a SubprocVecEnv (one process per env) or a
+    ThreadedVecEnv (all envs in this process, stepped on a thread pool)
+    """
+    def make_env():
+        return LinkEnv(render=False, obs_mode=obs_mode, frame_skip=frame_skip)
+
+    # Imported before the memory baseline so that neither model is charged for SB3/torch
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+
+    from env.threaded_vec_env import ThreadedVecEnv
+
+    start_method = worker_start_method()
+    measure_memory = sys.platform.startswith("linux")
+    if measure_memory:
+        if backend == "subproc" and start_method == "forkserver":
+            warm_forkserver()
+        # Idle emulators left in the pool by earlier configs would hide what the threaded envs cost
+        get_pool().close()
+        pss_before = tree_pss_mb()
+    if backend == "threaded":
+        vec_env = ThreadedVecEnv([make_env for _ in range(n_workers)])
+    else:
+        vec_env = SubprocVecEnv([make_env for _ in range(n_workers)], start_method=start_method)
+    rng = np.random.default_rng(seed)
+    vec_env.reset()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        vec_env.step(rng.integers(vec_env.action_space.n, size=n_workers))
+    step_seconds = time.perf_counter() - start
+
+    metrics = {
+        "steps_per_sec": steps * n_workers / step_seconds,
+        "steps_per_sec_per_worker": steps / step_seconds,
+    }
+    if measure_memory:
+        # Same metric for both models: growth of this process tree (workers, forkserver) per env
+        metrics["pss_mb_per_env"] = (tree_pss_mb() - pss_before) / n_workers
+    vec_env.close()
+    return metrics
+
+
+def bench_worker_memory(n_workers, obs_mode, start_method, steps, seed):
+    """
+    Startup time and per-worker memory of a SubprocVecEnv started with `start_method`
+    ("forkserver" preloads the ROM, base state and imports via worker_start_method)
+    """
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+
+    def make_env():
+        return LinkEnv(render=False, obs_mode=obs_mode)
+
+    if start_method == "forkserver":
+        start_method = worker_start_method()
+    elif start_method == "fork":
+        # The old way of sharing: boot one emulator in this process before forking it
+        get_pool().prewarm(1)
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    vec_env = SubprocVecEnv([make_env for _ in range(n_workers)], start_method=start_method)
+    vec_env.reset()
+    startup_seconds = time.perf_counter() - start
+    # Step a little so every worker has touched its emulator and observation buffers
+    for _ in range(steps):
+        vec_env.step(rng.integers(vec_env.action_space.n, size=n_workers))
+
+    memory = [process_memory_mb(process.pid) for process in vec_env.processes]
+    vec_env.close()
+    return {
+        "startup_sec": startup_seconds,
+        **{f"{key}_per_worker": float(np.mean([m[key] for m in memory])) for key in memory[0]},
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Print throughput ratios against a previous results file; return the list of regressions"""
+    with open(baseline_path) as f:
+        baseline = {entry["name"]: entry for entry in json.load(f)["results"]}
+
+    regressions = []
+    for entry in results:
+        old = baseline.get(entry["name"])
+        if old is None or "steps_per_sec" not in entry:
+            continue
+        ratio = entry["steps_per_sec"] / old["steps_per_sec"]
+        marker = "❌" if ratio < 1.0 - tolerance else "✅"
+        print(f"{marker} {entry['name']}: {old['steps_per_sec']:.1f} -> {entry['steps_per_sec']:.1f} steps/s ({ratio:.2f}x)",
+              file=sys.stderr)
+        if ratio < 1.0 - tolerance:
+            regressions.append(entry["name"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LinkEnv throughput")
+    parser.add_argument("--obs-modes", nargs="+", default=list(LinkEnv.OBS_MODES), choices=LinkEnv.OBS_MODES)
+    parser.add_argument("--frame-skips", nargs="+", type=int, default=[1, 5, 10])
+    parser.add_argument("--render", nargs="+", type=int, default=[0], choices=[0, 1],
+                        help="Render settings to cover (1 needs an SDL2 display)")
+    parser.add_argument("--workers", nargs="*", type=int, default=[1, 2, 4, 8],
+                        help="Vectorized worker counts to sweep (empty to skip)")
+    parser.add_argument("--backends", nargs="+", default=["subproc", "threaded"], choices=["subproc", "threaded"],
+                        help="Process-per-env (SubprocVecEnv) and/or in-process thread pool (ThreadedVecEnv)")
+    parser.add_argument("--memory-workers", type=int, default=8,
+                        help="Workers for the start-method memory benchmark (Linux only, 0 to skip)")
+    parser.add_argument("--start-methods", nargs="+", default=["spawn", "fork", "forkserver"],
+                        choices=["spawn", "fork", "forkserver"])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--resets", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Previous JSON results to compare steps/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before failing")
+    args = parser.parse_args()
+
+    results = []
+    for obs_mode, frame_skip, render in itertools.product(args.obs_modes, args.frame_skips, args.render):
+        name = f"single/{obs_mode}/skip{frame_skip}/render{render}"
+        print(f"⏱️ {name}", file=sys.stderr)
+        metrics = run_isolated(bench_single, obs_mode, frame_skip, bool(render), args.steps, args.resets, args.seed)
+        results.append({"name": name, "obs_mode": obs_mode, "frame_skip": frame_skip,
+                        "render": bool(render), "workers": 1, **metrics})
+
+    for backend, n_workers, obs_mode in itertools.product(args.backends, args.workers, args.obs_modes):
+        prefix = "vec" if backend == "subproc" else backend
+        name = f"{prefix}/{obs_mode}/workers{n_workers}"
+        print(f"⏱️ {name}", file=sys.stderr)
+        metrics = bench_vectorized(n_workers, obs_mode, 5, args.steps // n_workers, args.seed, backend)
+        results.append({"name": name, "backend": backend, "obs_mode": obs_mode, "frame_skip": 5,
+                        "render": False, "workers": n_workers, **metrics})
+
+    if args.memory_workers and sys.platform.startswith("linux"):
+        for start_method in args.start_methods:
+            name = f"memory/{start_method}/workers{args.memory_workers}"
+            print(f"⏱️ {name}", file=sys.stderr)
+            metrics = bench_worker_memory(args.memory_workers, "tiles", start_method, 100, args.seed)
+            results.append({"name": name, "start_method": start_method, "obs_mode": "tiles",
+                            "workers": args.memory_workers, **metrics})
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
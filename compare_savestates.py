@@ -2,17 +2,19 @@
 """
 Compare two save states to find RAM differences
 Perfect for controlled input testing to discover specific RAM addresses
+RAM is read straight from the state files, so no ROM or emulator is needed
 """
 
-from pyboy import PyBoy
 import os
 
+import numpy as np
+
+from env.state_file import SaveState
+
 def compare_savestates(base_state_path, test_state_path, action_description=""):
     """
     Compare two save states and show which RAM addresses changed
     """
-    rom_path = "roms/LinksAwakeningDX-Rev2.gbc"
-    
     print(f"\n{'='*60}")
     print(f"COMPARING SAVE STATES")
     if action_description:
@@ -21,15 +23,8 @@ def compare_savestates(base_state_path, test_state_path, action_description=""):
     print(f"Test:   {test_state_path}")
     print(f"{'='*60}")
     
-    # Load base state
-    pyboy_base = PyBoy(rom_path, window="null", cgb=True)
-    with open(base_state_path, "rb") as f:
-        pyboy_base.load_state(f)
-    
-    # Load test state  
-    pyboy_test = PyBoy(rom_path, window="null", cgb=True)
-    with open(test_state_path, "rb") as f:
-        pyboy_test.load_state(f)
+    base_memory = SaveState.open(base_state_path)
+    test_memory = SaveState.open(test_state_path)
     
     # Known position-related addresses to ignore
     position_addresses = {
@@ -38,9 +33,8 @@ def compare_savestates(base_state_path, test_state_path, action_description=""):
         0xFF98, 0xFF99, 0xFF9F, 0xFFA0,  # Position mirrors in High RAM
     }
     
-    # Compare memory across key ranges
+    # Compare memory across key ranges (ROM never differs between states, so it is not compared)
     memory_ranges = [
-        (0x0000, 0x00FF, "Zero Page"),
         (0xC000, 0xC0FF, "Work RAM Low"), 
         (0xD000, 0xD0FF, "Work RAM Mid"),
         (0xDB00, 0xDBFF, "Work RAM High"),
@@ -51,23 +45,24 @@ def compare_savestates(base_state_path, test_state_path, action_description=""):
     
     for start_addr, end_addr, range_name in memory_ranges:
         changes = []
+        base_block = base_memory[start_addr:end_addr + 1].astype(int)
+        test_block = test_memory[start_addr:end_addr + 1].astype(int)
         
-        for addr in range(start_addr, end_addr + 1):
+        for offset in np.flatnonzero(base_block != test_block):
+            addr = start_addr + int(offset)
             # Skip known position addresses
             if addr in position_addresses:
                 continue
-                
-            base_val = pyboy_base.memory[addr]
-            test_val = pyboy_test.memory[addr]
-            
-            if base_val != test_val:
-                changes.append({
-                    'addr': addr,
-                    'base': base_val,
-                    'test': test_val,
-                    'diff': test_val - base_val,
-                    'range': range_name
-                })
+
+            base_val = int(base_block[offset])
+            test_val = int(test_block[offset])
+            changes.append({
+                'addr': addr,
+                'base': base_val,
+                'test': test_val,
+                'diff': test_val - base_val,
+                'range': range_name
+            })
         
         if changes:
             print(f"\n🎯 {range_name} (0x{start_addr:04X}-0x{end_addr:04X}): {len(changes)} changes")
@@ -93,10 +88,6 @@ def compare_savestates(base_state_path, test_state_path, action_description=""):
     else:
         print("\n❌ No changes found - states might be identical")
     
-    # Cleanup
-    pyboy_base.stop()
-    pyboy_test.stop()
-    
     return all_changes
 
 def compare_multiple_states():
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Exploration analytics over recorded RAM traces (see env/trace.py)
+Streams traces in chunks, aggregates per-map visit counts and first-visit steps,
+and writes coverage heatmaps plus "time to first visit" curves per run
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from env.trace import TraceReader
+
+# Heatmap colormap anchors (black -> purple -> orange -> yellow)
+COLORMAP_ANCHORS = np.array([[0, 0, 0], [80, 18, 123], [229, 92, 48], [252, 255, 164]], dtype=np.float64)
+CURVE_POINTS = 1000
+
+
+def cell_keys(chunk):
+    """Pack (map_id, y, x) into one uint32 per row"""
+    return (chunk["map_id"].astype(np.uint32) << 16) | (chunk["y"].astype(np.uint32) << 8) | chunk["x"]
+
+
+class CoverageStats:
+    """
+    Visit counts and first-visit steps per (map, y, x) cell, kept as sorted key arrays so memory
+    scales with the number of distinct cells rather than the number of steps
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint32)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.first_step = np.empty(0, dtype=np.int64)
+        self.total_steps = 0
+
+    def add_chunk(self, keys, steps):
+        unique, first_index, counts = np.unique(keys, return_index=True, return_counts=True)
+        chunk_first = steps[first_index].astype(np.int64)
+
+        merged = np.union1d(self.keys, unique)
+        merged_counts = np.zeros(len(merged), dtype=np.int64)
+        merged_first = np.full(len(merged), np.iinfo(np.int64).max, dtype=np.int64)
+
+        old = np.searchsorted(merged, self.keys)
+        merged_counts[old] = self.counts
+        merged_first[old] = self.first_step
+
+        new = np.searchsorted(merged, unique)
+        merged_counts[new] += counts
+        merged_first[new] = np.minimum(merged_first[new], chunk_first)
+
+        self.keys, self.counts, self.first_step = merged, merged_counts, merged_first
+        self.total_steps += len(keys)
+
+    def add_trace(self, path, chunk_rows):
+        reader = TraceReader(path)
+        for chunk in reader.iter_chunks(chunk_rows, ["step", "x", "y", "map_id"]):
+            self.add_chunk(cell_keys(chunk), chunk["step"])
+
+    def maps(self):
+        return np.unique(self.keys >> 16)
+
+    def heatmap(self, map_id):
+        """256x256 visit counts for one map"""
+        grid = np.zeros((256, 256), dtype=np.int64)
+        in_map = (self.keys >> 16) == map_id
+        keys = self.keys[in_map]
+        grid[(keys >> 8) & 0xFF, keys & 0xFF] = self.counts[in_map]
+        return grid
+
+    def first_visit_curve(self, points=CURVE_POINTS):
+        """(steps, distinct cells discovered by that step), downsampled to at most `points`"""
+        order = np.sort(self.first_step)
+        cells = np.arange(1, len(order) + 1)
+        if len(order) > points:
+            pick = np.linspace(0, len(order) - 1, points).astype(np.int64)
+            order, cells = order[pick], cells[pick]
+        return order, cells
+
+    def summary(self):
+        per_map = {}
+        for map_id in self.maps():
+            in_map = (self.keys >> 16) == map_id
+            per_map[f"0x{int(map_id):02X}"] = {
+                "visits": int(self.counts[in_map].sum()),
+                "cells": int(in_map.sum()),
+                "first_step": int(self.first_step[in_map].min()),
+            }
+        return {"total_steps": self.total_steps, "distinct_cells": int(len(self.keys)), "maps": per_map}
+
+
+def render_heatmap(grid, path, scale=2):
+    """Log-scaled heatmap cropped to the visited bounding box"""
+    ys, xs = np.nonzero(grid)
+    grid = grid[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+    intensity = np.log1p(grid) / np.log1p(grid.max())
+    positions = intensity * (len(COLORMAP_ANCHORS) - 1)
+    anchor_index = np.arange(len(COLORMAP_ANCHORS))
+    rgb = np.stack([np.interp(positions, anchor_index, COLORMAP_ANCHORS[:, c]) for c in range(3)], axis=-1)
+    image = Image.fromarray(rgb.astype(np.uint8))
+    image.resize((image.width * scale, image.height * scale), Image.NEAREST).save(path)
+
+
+def plot_curves(curves, path):
+    """First-visit curves for all runs in one chart (skipped if matplotlib is not installed)"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️ matplotlib not installed, skipping curve plot (CSV still written)")
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for label, (steps, cells) in curves.items():
+        ax.plot(steps, cells, label=label)
+    ax.set_xlabel("step")
+    ax.set_ylabel("distinct (map, y, x) cells visited")
+    ax.set_title("Time to first visit")
+    ax.legend()
+    fig.savefig(path, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coverage heatmaps and first-visit curves from RAM traces")
+    parser.add_argument("--run", nargs=2, action="append", metavar=("LABEL", "GLOB"), required=True,
+                        help="Label and trace file glob for one run (repeat to compare runs)")
+    parser.add_argument("--out", default="analysis", help="Output directory")
+    parser.add_argument("--chunk-rows", type=int, default=1 << 20, help="Rows streamed per chunk")
+    parser.add_argument("--no-heatmaps", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    curves = {}
+    for label, pattern in args.run:
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            print(f"❌ {label}: no traces match {pattern}")
+            continue
+
+        stats = CoverageStats()
+        for path in paths:
+            stats.add_trace(path, args.chunk_rows)
+        summary = stats.summary()
+        summary["traces"] = paths
+        with open(os.path.join(args.out, f"{label}_summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+        if not args.no_heatmaps:
+            for map_id in stats.maps():
+                render_heatmap(stats.heatmap(map_id), os.path.join(args.out, f"{label}_map_{int(map_id):02X}.png"))
+
+        curves[label] = stats.first_visit_curve()
+        print(f"📊 {label}: {summary['total_steps']} steps, {summary['distinct_cells']} cells, "
+              f"{len(summary['maps'])} maps from {len(paths)} trace(s)")
+
+    with open(os.path.join(args.out, "first_visit.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["run", "step", "cells"])
+        for label, (steps, cells) in curves.items():
+            writer.writerows((label, int(step), int(count)) for step, count in zip(steps, cells))
+    if curves:
+        plot_curves(curves, os.path.join(args.out, "first_visit.png"))
+    print(f"✅ Wrote analysis to {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
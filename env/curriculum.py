@@ -0,0 +1,113 @@
+# Reset-time start-state scheduler over base, saved and milestone states
+import glob
+import os
+
+import numpy as np
+
+from env.emulator_pool import BASE_STATE_PATH
+from env.state_store import read_state
+
+MILESTONE_STATE_DIR = "roms/training_states"
+
+
+class StartStateScheduler:
+    """
+    Samples LinkEnv start states from a weighted, in-memory pool.
+
+    Every state keeps an attempt/success count. The weight is p * (1 - p) on the smoothed
+    success rate p, so states that are always or never solved fade out while states on the
+    frontier (and untried ones, p = 0.5) are sampled most. min_weight keeps every state
+    reachable. New milestone states written by LinkEnv are picked up by refresh(); once the pool
+    holds max_states, each new state replaces the lowest-weight one (the base state and any
+    state_paths given here are never replaced).
+    """
+
+    def __init__(self, state_paths=None, state_dir=MILESTONE_STATE_DIR, base_state=BASE_STATE_PATH,
+                 max_states=64, min_weight=0.02, refresh_every=50):
+        self.state_dir = state_dir
+        self.max_states = max_states
+        self.min_weight = min_weight
+        self.refresh_every = refresh_every
+
+        self.names = []
+        self.states = {}  # name -> savestate bytes
+        self.attempts = {}
+        self.successes = {}
+        self.evicted = set()  # Names dropped to make room; refresh() does not load them again
+        self._resets = 0
+
+        if base_state and os.path.exists(base_state):
+            self.add_file(base_state)
+        for path in state_paths or []:
+            self.add_file(path)
+        self.pinned = set(self.names)
+        self.refresh()
+
+    def add_state(self, name, data):
+        if name in self.states:
+            return
+        self.names.append(name)
+        self.states[name] = data
+        self.attempts[name] = 0
+        self.successes[name] = 0
+
+    def add_file(self, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in self.states:
+            self.add_state(name, read_state(path))
+
+    def remove_state(self, name):
+        self.names.remove(name)
+        del self.states[name], self.attempts[name], self.successes[name]
+        self.evicted.add(name)
+
+    def _evict(self):
+        """Drop the lowest-weight state that is not pinned; False if there is none"""
+        candidates = [i for i, name in enumerate(self.names) if name not in self.pinned]
+        if not candidates:
+            return False
+        weights = self.weights()
+        self.remove_state(self.names[min(candidates, key=lambda i: weights[i])])
+        return True
+
+    def refresh(self):
+        """Load milestone states that appeared in state_dir since the last refresh, newest first"""
+        if not self.state_dir or not os.path.isdir(self.state_dir):
+            return
+        paths = sorted(glob.glob(os.path.join(self.state_dir, "*.state")), key=os.path.getmtime, reverse=True)
+        seen = self.states.keys() | self.evicted
+        new_paths = [path for path in paths if os.path.splitext(os.path.basename(path))[0] not in seen]
+        new_paths = new_paths[:self.max_states]
+        # Oldest of the kept ones first, so the newest states are the last to be evicted
+        for path in reversed(new_paths):
+            if len(self.states) >= self.max_states and not self._evict():
+                break
+            self.add_file(path)
+
+    def weights(self):
+        attempts = np.array([self.attempts[name] for name in self.names], dtype=np.float64)
+        successes = np.array([self.successes[name] for name in self.names], dtype=np.float64)
+        rate = (successes + 1.0) / (attempts + 2.0)
+        weights = np.maximum(rate * (1.0 - rate), self.min_weight)
+        return weights / weights.sum()
+
+    def sample(self, rng):
+        """Pick a start state; returns (name, savestate bytes)"""
+        self._resets += 1
+        if self.refresh_every and self._resets % self.refresh_every == 0:
+            self.refresh()
+        name = self.names[rng.choice(len(self.names), p=self.weights())]
+        return name, self.states[name]
+
+    def report(self, name, success):
+        """Record the outcome of an episode that started from `name`"""
+        if name not in self.attempts:
+            return
+        self.attempts[name] += 1
+        self.successes[name] += int(success)
+
+    def summary(self):
+        return {
+            name: {"attempts": self.attempts[name], "successes": self.successes[name], "weight": float(weight)}
+            for name, weight in zip(self.names, self.weights())
+        }
@@ -0,0 +1,150 @@
+# Pre-warmed PyBoy instances shared by LinkEnv construction and reset
+import io
+import multiprocessing
+import threading
+
+import numpy as np
+
+ROM_PATH = "roms/LinksAwakeningDX-Rev2.gbc"
+BASE_STATE_PATH = "roms/base.state"
+# Imported by the forkserver before it forks workers; see worker_start_method()
+WORKER_PRELOAD = "env.worker_preload"
+
+
+class EmulatorPool:
+    """
+    Boots PyBoy instances ahead of time and hands them out with the base state loaded.
+    The ROM and base state are read from disk once and kept in memory, so every later restore is
+    an in-memory load_state instead of a ROM boot. A pool preloaded and prewarmed in a parent
+    process is inherited copy-on-write by forked workers (see worker_start_method).
+    """
+
+    def __init__(self, rom_path=ROM_PATH, state_path=BASE_STATE_PATH):
+        self.rom_path = rom_path
+        self.state_path = state_path
+        self._rom_data = None
+        self._base_state = None
+        self._idle = {}  # window type -> list of booted PyBoy instances
+        self._noop_states = {}  # (max_frames, count) -> list of (frames, savestate bytes)
+        self._lock = threading.Lock()
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    @property
+    def rom_data(self):
+        """Raw ROM image (read once)"""
+        if self._rom_data is None:
+            self._rom_data = self._read(self.rom_path)
+        return self._rom_data
+
+    @property
+    def base_state(self):
+        """Raw bytes of the base savestate (read once)"""
+        if self._base_state is None:
+            self._base_state = self._read(self.state_path)
+        return self._base_state
+
+    def preload(self):
+        """Read the ROM and base state now, e.g. in a parent process whose workers inherit the pool"""
+        return self.rom_data, self.base_state
+
+    def _boot(self, window):
+        # Imported here so that importing env.link_env does not pull in the emulator (and SDL)
+        from pyboy import PyBoy
+
+        # Booting from memory skips the ROM read and PyBoy's search for .ram/.rtc files next to it
+        pyboy = PyBoy(io.BytesIO(self.rom_data), window=window, cgb=True, sound=False, sound_emulated=False)
+        # Maximum stable speeds for fast training
+        pyboy.set_emulation_speed(15 if window == "SDL2" else 30)
+        return pyboy
+
+    def prewarm(self, count, window="null"):
+        """Boot `count` emulators now so later acquire() calls return immediately"""
+        booted = [self._boot(window) for _ in range(count)]
+        with self._lock:
+            self._idle.setdefault(window, []).extend(booted)
+
+    def acquire(self, window="null"):
+        """Get an emulator with the base state loaded, booting one only if the pool is empty"""
+        with self._lock:
+            idle = self._idle.get(window)
+            pyboy = idle.pop() if idle else None
+        if pyboy is None:
+            pyboy = self._boot(window)
+        self.restore(pyboy)
+        return pyboy
+
+    def restore(self, pyboy, state=None):
+        """Load `state` (bytes, default the base state) into an existing emulator"""
+        pyboy.load_state(io.BytesIO(self.base_state if state is None else state))
+
+    def noop_states(self, pyboy, max_frames, count=16):
+        """
+        Snapshots of the base state after 1..max_frames frames without input, for randomized
+        no-op starts. They are built once per process along a single run of `pyboy` (at most
+        max_frames frames in total), which is left back at the base state.
+        """
+        key = (max_frames, count)
+        with self._lock:
+            cached = self._noop_states.get(key)
+        if cached is not None:
+            return cached
+
+        targets = np.unique(np.linspace(1, max_frames, min(count, max_frames)).round().astype(int))
+        states = []
+        self.restore(pyboy)
+        frame = 0
+        for target in targets:
+            if int(target) - frame > 1:
+                pyboy.tick(int(target) - frame - 1, False)
+            # Render the last frame so the saved screen buffer matches the RAM (pixel observations)
+            pyboy.tick(1, True)
+            frame = int(target)
+            buffer = io.BytesIO()
+            pyboy.save_state(buffer)
+            states.append((frame, buffer.getvalue()))
+        self.restore(pyboy)
+
+        with self._lock:
+            return self._noop_states.setdefault(key, states)
+
+    def release(self, pyboy, window="null"):
+        """Return an emulator to the pool for reuse by the next env"""
+        with self._lock:
+            self._idle.setdefault(window, []).append(pyboy)
+
+    def close(self):
+        """Stop every idle emulator"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for pyboy in instances:
+                pyboy.stop(save=False)
+
+
+_default_pool = None
+
+
+def get_pool():
+    """Process-wide pool used by LinkEnv unless one is passed explicitly"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = EmulatorPool()
+    return _default_pool
+
+
+def worker_start_method(preload=True):
+    """
+    Start method for SubprocVecEnv workers: "forkserver" where available, else the platform default.
+    The forkserver is a clean process (no torch threads, unlike the trainer) that imports
+    WORKER_PRELOAD once; every worker forks from it with LinkEnv imported, the ROM and base state
+    read and one emulator booted, all shared copy-on-write instead of loaded again per worker.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return None
+    if preload:
+        # Only takes effect if the forkserver has not been started yet in this process
+        multiprocessing.set_forkserver_preload([WORKER_PRELOAD])
+    return "forkserver"
@@ -1,10 +1,54 @@
 import gymnasium as gym
 import numpy as np
-from pyboy import PyBoy
-from pyboy.utils import WindowEvent
 from gymnasium.spaces import Box, Discrete
+from functools import lru_cache
+import itertools
+from time import perf_counter
 import time
+import io
 import os
+from env import ram_map
+from env.curriculum import MILESTONE_STATE_DIR
+from env.emulator_pool import get_pool
+from env.state_catalog import StateCatalog, read_fields
+from env.state_store import read_state, write_state
+from env.trace import TraceRecorder
+from env.profiler import (
+    StepProfiler, PHASE_TICK, PHASE_OBS, PHASE_REWARD, PHASE_ITEM_FLAGS, PHASE_SAVE_STATE, PHASE_RESET,
+    COUNT_STEPS, COUNT_TICKS, COUNT_MEMORY_READS, COUNT_STATE_SAVES,
+)
+
+# Tile-map observation layout (visible background is 18x20 tiles of 8x8 pixels)
+TILE_ROWS = 18
+TILE_COLS = 20
+TILE_ID_COUNT = 512  # 256 tile indices per VRAM bank, 2 banks in CGB mode
+BG_MAP_LOW = 0x9800
+BG_MAP_HIGH = 0x9C00
+OAM_START = 0xFE00
+OAM_SPRITES = 40
+
+# Offsets of the reward fields inside the per-step WRAM snapshot
+SNAP_X = ram_map.LINK_X - ram_map.SNAPSHOT_START
+SNAP_Y = ram_map.LINK_Y - ram_map.SNAPSHOT_START
+SNAP_MAP_ID = ram_map.MAP_ID - ram_map.SNAPSHOT_START
+SNAP_HEALTH = ram_map.HEALTH - ram_map.SNAPSHOT_START
+SNAP_SHIELD_LEVEL = ram_map.SHIELD_LEVEL - ram_map.SNAPSHOT_START
+SNAP_FLAGS = slice(ram_map.FLAG_START - ram_map.SNAPSHOT_START, ram_map.FLAG_END + 1 - ram_map.SNAPSHOT_START)
+_env_counter = itertools.count()  # Index of each LinkEnv created in this process
+
+# Layout of info["diagnostics"]: one int32 per field, so vectorized envs can np.stack them
+DIAGNOSTICS = ("episode_steps", "skipped_frames", "map_id", "x", "y", "health")
+
+
+@lru_cache(maxsize=None)
+def _tile_lut(mapping=None):
+    """Build (once per mapping) the lookup table from raw tile IDs to observation IDs"""
+    lut = np.arange(TILE_ID_COUNT, dtype=np.uint16)
+    if mapping:
+        for raw_id, obs_id in mapping:
+            lut[raw_id] = obs_id
+    lut.setflags(write=False)
+    return lut
 
 
 class LinkEnv(gym.Env):
@@ -12,21 +56,75 @@ class LinkEnv(gym.Env):
     Reinforcement learning environment for Link's Awakening DX using PyBoy.
     """
 
-    def __init__(self, render=False):
+    OBS_MODES = ("pixels", "tiles")
+
+    def __init__(self, render=False, obs_mode="pixels", tile_mapping=None, profile=False, frame_skip=5, pool=None,
+                 start_states=None, max_steps=None, trace_path=None, noop_max=0, noop_cache_size=16,
+                 sticky_action_prob=0.0, catalog=None, auto_advance=False, max_auto_frames=600,
+                 state_dir=MILESTONE_STATE_DIR):
         super().__init__()
 
+        # Optional StateCatalog (or catalog path) that milestone saves are indexed into, tagged with this run
+        self.catalog = StateCatalog(catalog) if isinstance(catalog, str) else catalog
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        # Where milestone states are saved (None = don't save, e.g. for evaluation envs)
+        self.state_dir = state_dir
+
+        # Per-step RAM trace file; "{pid}" keeps worker processes apart and "{env}" (a per-process
+        # counter) keeps envs in one process apart (DummyVecEnv, ThreadedVecEnv)
+        self.env_index = next(_env_counter)
+        self.trace = TraceRecorder(trace_path.format(pid=os.getpid(), env=self.env_index)) if trace_path else None
+
+        # Optional StartStateScheduler picking reset states; None always starts from base.state
+        self.start_states = start_states
+        self.start_state = None
+        # Truncate episodes after this many steps (None = never, as before)
+        self.max_steps = max_steps
+        self.episode_steps = 0
+        self.episode_milestones = {}  # Reached this episode, relative to its start state
+
+        # Frames emulated per action (button held for the first one)
+        if frame_skip < 1:
+            raise ValueError(f"frame_skip must be at least 1, got {frame_skip}")
+        self.frame_skip = frame_skip
+
+        # Decorrelate parallel workers: repeat the previous action with this probability, and start
+        # base-state episodes after a random 1..noop_max idle frames (from a per-process snapshot cache)
+        if not 0.0 <= sticky_action_prob < 1.0:
+            raise ValueError(f"sticky_action_prob must be in [0, 1), got {sticky_action_prob}")
+        self.sticky_action_prob = sticky_action_prob
+        self.last_action = None
+        self.noop_max = noop_max
+
+        # Tick through text boxes and room transitions inside step() (at most max_auto_frames per step),
+        # so the policy is only asked for actions while Link can move
+        self.auto_advance = auto_advance
+        self.max_auto_frames = max_auto_frames
+
+        # Per-phase timers/counters; None keeps the disabled hot path free of timing calls
+        self.profiler = StepProfiler() if profile else None
+
+        if obs_mode not in self.OBS_MODES:
+            raise ValueError(f"Unknown obs_mode {obs_mode!r}, expected one of {self.OBS_MODES}")
+        self.obs_mode = obs_mode
+        # Raw (bank * 256 + index) tile ID -> observation tile ID, e.g. to merge look-alike tiles
+        self.tile_lut = _tile_lut(tuple(sorted(tile_mapping.items())) if tile_mapping else None)
+
         self.render_mode = "rgb_array" if render else None
         self.render_enabled = render
+        # Tile observations come from VRAM/OAM, so headless tile envs never need a rendered frame
+        self.render_frames = render or obs_mode == "pixels"
 
-        window_arg = "SDL2" if render else "null"
-        self.pyboy = PyBoy("roms/LinksAwakeningDX-Rev2.gbc", window=window_arg, cgb=True, sound=False, sound_emulated=False)
-        # Maximum stable speeds for fast training
-        speed = 15 if render else 30
-        self.pyboy.set_emulation_speed(speed)
+        # Emulators come pre-booted from a pool and are restored from an in-memory base state
+        self.pool = pool if pool is not None else get_pool()
+        self.window_arg = "SDL2" if render else "null"
+        self.pyboy = self.pool.acquire(self.window_arg)
+        self.noop_states = self.pool.noop_states(self.pyboy, noop_max, noop_cache_size) if noop_max > 0 else None
         
-        # Track state for reward calculation
+        # Track state for reward calculation; ram/previous_ram are consecutive WRAM snapshots
+        self.ram = None
+        self.previous_ram = None
         self.visited_positions = set()
-        self.previous_flags = {}
         self.previous_health = None
         self.previous_x = None
         self.previous_y = None
@@ -34,7 +132,6 @@ class LinkEnv(gym.Env):
         # Item flag monitoring setup
         self.FLAG_START = 0xDB00
         self.FLAG_END = 0xDBFF
-        self.flag_range = range(self.FLAG_START, self.FLAG_END + 1)
         self.discovered_items = {}
         self.state_save_count = 0
         
@@ -47,12 +144,16 @@ class LinkEnv(gym.Env):
         self.previous_shield_equipped = False
         self.step_count = 0
         self.milestones = {}  # Track when major events happen
+        self.step_events = {}  # Milestones reached during the current step only
         
         # Map/area transition tracking (D700-D79B range from Data Crystal)
         self.discovered_map_values = set()  # Track unique map values seen
         
         # Ensure states directory exists
-        os.makedirs("roms/training_states", exist_ok=True)
+        if state_dir is not None:
+            os.makedirs(state_dir, exist_ok=True)
+
+        from pyboy.utils import WindowEvent
 
         self.buttons = [
             (WindowEvent.PRESS_ARROW_UP, WindowEvent.RELEASE_ARROW_UP),
@@ -64,24 +165,39 @@ class LinkEnv(gym.Env):
             (WindowEvent.PRESS_BUTTON_START, WindowEvent.RELEASE_BUTTON_START)
         ]
         self.action_space = Discrete(len(self.buttons))
-        self.observation_space = Box(low=0, high=255, shape=(144, 160, 3), dtype=np.uint8)
+        if self.obs_mode == "tiles":
+            # Channel 0: background tile IDs, channel 1: sprite tile ID + 1 (0 = no sprite)
+            self.observation_space = Box(low=0, high=TILE_ID_COUNT, shape=(TILE_ROWS, TILE_COLS, 2), dtype=np.uint16)
+        else:
+            self.observation_space = Box(low=0, high=255, shape=(144, 160, 3), dtype=np.uint8)
+
+        # Precomputed offsets into the 32x32 background map for the visible 18x20 window
+        self._tile_row_offsets = np.arange(TILE_ROWS)
+        self._tile_col_offsets = np.arange(TILE_COLS)
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
+        profiler = self.profiler
+        if profiler:
+            start = perf_counter()
 
-        self.pyboy.stop()
-        window_arg = "SDL2" if self.render_enabled else "null"
-        self.pyboy = PyBoy("roms/LinksAwakeningDX-Rev2.gbc", window=window_arg, cgb=True, sound=False, sound_emulated=False)
-        # Maximum stable speeds for fast training
-        speed = 15 if self.render_enabled else 30
-        self.pyboy.set_emulation_speed(speed)
+        # An episode counts as a success for its start state if it reached a milestone of its own
+        if self.start_states is not None and self.start_state is not None and self.episode_steps:
+            self.start_states.report(self.start_state, bool(self.episode_milestones))
 
-        with open("roms/base.state", "rb") as f:
-            self.pyboy.load_state(f)
+        # Restore a cached snapshot instead of rebooting the ROM
+        self.start_state, state = self._pick_start_state(options)
+        info = {"start_state": self.start_state}
+        if state is None and self.noop_states:
+            info["noop_frames"], state = self.noop_states[self.np_random.integers(len(self.noop_states))]
+        self.pool.restore(self.pyboy, state)
+        self.last_action = None
+        self.episode_steps = 0
+        if self.trace:
+            self.trace.start_episode()
 
         # Reset tracking variables
         self.visited_positions = set()
-        self.previous_flags = {}
         self.previous_health = None
         self.previous_x = None
         self.previous_y = None
@@ -89,61 +205,239 @@ class LinkEnv(gym.Env):
         
         # Initialize baseline state
         self._update_baseline()
+        self.episode_milestones = {}
+        self.episode_maps = {int(self.ram[SNAP_MAP_ID])}
+        self.episode_start_inside = self._inside_house(self.previous_x, self.previous_y)
+        self.episode_start_shield = int(self.ram[SNAP_SHIELD_LEVEL])
 
         obs = self._get_obs()
-        info = {}
+        if profiler:
+            profiler.add_time(PHASE_RESET, perf_counter() - start)
         return obs, info
 
     def step(self, action_idx):
         # Increment step counter
         self.step_count += 1
+        self.episode_steps += 1
+        profiler = self.profiler
+        if profiler:
+            start = perf_counter()
         
+        # Each tick() call runs its frames without the GIL, so the held frames go in one call.
+        # Only the final frame is rendered, and only if something reads the screen.
+        if (self.sticky_action_prob and self.last_action is not None
+                and self.np_random.random() < self.sticky_action_prob):
+            action_idx = self.last_action
+        self.last_action = action_idx
         press_event, release_event = self.buttons[action_idx]
         self.pyboy.send_input(press_event)
-        self.pyboy.tick()
+        self.pyboy.tick(1, self.render_frames and self.frame_skip == 1)
         self.pyboy.send_input(release_event)
+        if self.frame_skip > 1:
+            self.pyboy.tick(self.frame_skip - 1, self.render_frames)
+        skipped_frames = self._advance_uncontrollable() if self.auto_advance else 0
 
-        for _ in range(4):
-            self.pyboy.tick()
+        if profiler:
+            ticked = perf_counter()
+            profiler.add_time(PHASE_TICK, ticked - start)
+            profiler.count(COUNT_TICKS, self.frame_skip + skipped_frames)
+            profiler.count(COUNT_STEPS)
 
         obs = self._get_obs()
+
+        if profiler:
+            observed = perf_counter()
+            profiler.add_time(PHASE_OBS, observed - ticked)
+
+        self.step_events = {}
         reward = self._calculate_reward()
         terminated = False
-        truncated = False
-        info = {"milestones": self.milestones.copy()}  # Include milestones in info
+        truncated = self.max_steps is not None and self.episode_steps >= self.max_steps
+        # Only this step's new milestones travel with every step; the full table comes at episode end
+        ram = self.ram
+        info = {"diagnostics": np.array([self.episode_steps, skipped_frames, ram[SNAP_MAP_ID], ram[SNAP_X],
+                                         ram[SNAP_Y], ram[SNAP_HEALTH]], dtype=np.int32)}
+        if self.step_events:
+            info["events"] = self.step_events
+        if terminated or truncated:
+            info["milestones"] = self.get_milestones()
+            info["episode_milestones"] = self.episode_milestones.copy()
+
+        if self.trace:
+            self._record_trace(action_idx, reward)
+
+        if profiler:
+            # Reward time includes the item flag scan and saves, which are also timed on their own
+            profiler.add_time(PHASE_REWARD, perf_counter() - observed)
+            info["profile"] = profiler.summary()
 
         return obs, reward, terminated, truncated, info
 
+    def _record_milestone(self, name):
+        self.milestones[name] = self.step_count
+        self.step_events[name] = self.step_count
+
+    @staticmethod
+    def _inside_house(x, y):
+        return 70 <= x <= 90 and 70 <= y <= 90
+
+    def _track_episode_milestones(self, x, y, map_id, shield_level):
+        """
+        Milestones reached in this episode relative to its start state, whether or not an earlier
+        episode already reached (and was rewarded for) them; they judge start states for the curriculum
+        """
+        reached = self.episode_milestones
+        if self.episode_start_inside and "left_house" not in reached and not self._inside_house(x, y):
+            reached["left_house"] = self.episode_steps
+        if map_id not in self.episode_maps:
+            self.episode_maps.add(map_id)
+            reached.setdefault(f"area_map_{map_id:02X}", self.episode_steps)
+        if shield_level > self.episode_start_shield:
+            reached.setdefault("shield_equipped", self.episode_steps)
+
+    def get_milestones(self):
+        """Every milestone reached so far -> step_count when it happened (e.g. via VecEnv.env_method)"""
+        return self.milestones.copy()
+
+    def reset_profiler(self):
+        """Start a new profiling window, so summaries cover only the steps since (e.g. via VecEnv.env_method)"""
+        if self.profiler:
+            self.profiler.reset()
+
+    def _advance_uncontrollable(self):
+        """
+        Tick frame_skip frames at a time while input is blocked; text boxes get an A press per chunk
+        since they only advance on input. Choice prompts (yes/no, shop confirmations) stop the skip so
+        the policy answers them itself. Reward is computed once afterwards from the RAM delta over
+        the whole span. Returns the number of frames skipped.
+        """
+        memory = self.pyboy.memory
+        press_a, release_a = self.buttons[4]
+        skipped = reads = 0
+        while skipped < self.max_auto_frames:
+            # Same check as ram_map.input_blocked, reusing the dialog read
+            dialog = memory[ram_map.DIALOG_STATE]
+            reads += 1 if dialog else 2
+            if not dialog and not memory[ram_map.ROOM_TRANSITION]:
+                break
+            if (dialog & ram_map.DIALOG_STATE_MASK) == ram_map.DIALOG_CHOICE:
+                break
+            if dialog:
+                self.pyboy.send_input(press_a)
+                self.pyboy.tick(1, self.render_frames and self.frame_skip == 1)
+                self.pyboy.send_input(release_a)
+                if self.frame_skip > 1:
+                    self.pyboy.tick(self.frame_skip - 1, self.render_frames)
+            else:
+                self.pyboy.tick(self.frame_skip, self.render_frames)
+            skipped += self.frame_skip
+        if self.profiler:
+            self.profiler.count(COUNT_MEMORY_READS, reads)
+        return skipped
+
+    def _pick_start_state(self, options):
+        """Returns (name, savestate bytes or None for the pool's base state)"""
+        requested = (options or {}).get("start_state")
+        if requested is not None:
+            if self.start_states is not None and requested in self.start_states.states:
+                return requested, self.start_states.states[requested]
+            return os.path.splitext(os.path.basename(requested))[0], read_state(requested)
+        if self.start_states is not None:
+            return self.start_states.sample(self.np_random)
+        return "base", None
+
     def render(self):
         return np.array(self.pyboy.screen.image)
 
     def close(self):
-        self.pyboy.stop()
+        if self.trace:
+            self.trace.close()
+        if self.pyboy is None:
+            return
+        if self.render_enabled:
+            # Pool emulators boot from ROM bytes, so there is no ROM path to write battery RAM next to
+            self.pyboy.stop(save=False)
+        else:
+            # Headless emulators go back to the pool for the next env in this process
+            self.pool.release(self.pyboy, self.window_arg)
+        self.pyboy = None
+
+    def _record_trace(self, action_idx, reward):
+        """Append this step's position, map, health, flag block, action and reward to the trace"""
+        ram = self.ram
+        self.trace.record(
+            self.step_count, ram[SNAP_X], ram[SNAP_Y], ram[SNAP_MAP_ID], ram[SNAP_HEALTH], ram[SNAP_FLAGS],
+            action_idx, reward,
+        )
+        # Keep readers of a live run reasonably up to date
+        if self.trace.rows_written % 10_000 == 0:
+            self.trace.flush()
 
     def _get_obs(self):
+        if self.obs_mode == "tiles":
+            return self._get_tile_obs()
         return np.array(self.pyboy.screen.image)[:, :, :3]
 
+    def _get_tile_obs(self):
+        """Build the tile-grid observation from the background map and OAM"""
+        memory = self.pyboy.memory
+        lcdc = memory[0xFF40]
+        scroll_y = memory[0xFF42]
+        scroll_x = memory[0xFF43]
+
+        # Bit 3 of LCDC selects which background map is displayed
+        map_start = BG_MAP_HIGH if lcdc & 0x08 else BG_MAP_LOW
+        tile_index = np.asarray(memory[0, map_start:map_start + 0x400], dtype=np.uint16)
+        tile_attrs = np.asarray(memory[1, map_start:map_start + 0x400], dtype=np.uint16)
+        raw_ids = tile_index + ((tile_attrs & 0x08) << 5)  # Attribute bit 3 = tile data in VRAM bank 1
+
+        # Visible window of the background map, wrapping around the 32x32 map
+        rows = ((scroll_y >> 3) + self._tile_row_offsets) & 0x1F
+        cols = ((scroll_x >> 3) + self._tile_col_offsets) & 0x1F
+        grid = np.empty((TILE_ROWS, TILE_COLS, 2), dtype=np.uint16)
+        grid[:, :, 0] = self.tile_lut[raw_ids.reshape(32, 32)[np.ix_(rows, cols)]]
+        grid[:, :, 1] = 0
+
+        # OAM entries are (y + 16, x + 8, tile, attributes)
+        oam = np.asarray(memory[OAM_START:OAM_START + OAM_SPRITES * 4], dtype=np.int16).reshape(OAM_SPRITES, 4)
+        sprite_y = oam[:, 0] - 16
+        sprite_x = oam[:, 1] - 8
+        visible = (sprite_y >= 0) & (sprite_y < 144) & (sprite_x >= 0) & (sprite_x < 160)
+        sprite_ids = oam[visible, 2] + ((oam[visible, 3] & 0x08) << 5)
+        grid[sprite_y[visible] >> 3, sprite_x[visible] >> 3, 1] = self.tile_lut[sprite_ids] + 1
+        if self.profiler:
+            self.profiler.count(COUNT_MEMORY_READS, 6)  # LCDC, SCY, SCX, both map banks, OAM
+        return grid
+
+    def _read_ram(self):
+        """Copy the reward-relevant WRAM window in one memory access"""
+        if self.profiler:
+            self.profiler.count(COUNT_MEMORY_READS)
+        return np.asarray(self.pyboy.memory[ram_map.SNAPSHOT_START:ram_map.SNAPSHOT_END], dtype=np.uint8)
+
     def _update_baseline(self):
         """Update baseline for position and flags"""
-        # Initialize position tracking
-        self.previous_x = self.pyboy.memory[0xD500]  # Link's X position
-        self.previous_y = self.pyboy.memory[0xD501]  # Link's Y position
-        self.previous_health = self.pyboy.memory[0xDB5A]  # Current health
-        
-        # Initialize flag baseline
-        for addr in self.flag_range:
-            self.previous_flags[addr] = self.pyboy.memory[addr]
+        self.ram = self.previous_ram = self._read_ram()
+        self.previous_x = int(self.ram[SNAP_X])  # Link's X position
+        self.previous_y = int(self.ram[SNAP_Y])  # Link's Y position
+        self.previous_health = int(self.ram[SNAP_HEALTH])  # Current health
     
     def _check_item_flags(self):
         """Check for new item acquisitions and save states"""
         new_acquisitions = []
-        
-        for addr in self.flag_range:
-            old_val = self.previous_flags[addr]
-            new_val = self.pyboy.memory[addr]
-            
-            # Flag changed from 0 to 1 AND we haven't rewarded this address before AND it's not an equipment slot
-            if old_val == 0 and new_val == 1 and addr not in self.discovered_items and addr not in self.EQUIPMENT_SLOTS:
+        profiler = self.profiler
+        if profiler:
+            start = perf_counter()
+
+        # Flags that changed from 0 to 1 since the previous snapshot
+        old_flags = self.previous_ram[SNAP_FLAGS]
+        new_flags = self.ram[SNAP_FLAGS]
+        for offset in np.flatnonzero((old_flags == 0) & (new_flags == 1)):
+            addr = self.FLAG_START + int(offset)
+            old_val, new_val = int(old_flags[offset]), int(new_flags[offset])
+
+            # ...that we haven't rewarded before and that aren't equipment slots
+            if addr not in self.discovered_items and addr not in self.EQUIPMENT_SLOTS:
                 new_acquisitions.append({
                     'addr': addr,
                     'old': old_val,
@@ -152,28 +446,53 @@ class LinkEnv(gym.Env):
                 self.discovered_items[addr] = new_val
                 
                 # Track milestone
-                self.milestones[f"item_0x{addr:04X}"] = self.step_count
+                self._record_milestone(f"item_0x{addr:04X}")
+                self.episode_milestones.setdefault(f"item_0x{addr:04X}", self.episode_steps)
                 
                 # Save state when item is acquired
                 timestamp = time.strftime("%H%M%S")
-                state_filename = f"roms/training_states/item_{addr:04X}_{self.state_save_count:03d}_{timestamp}.state"
-                with open(state_filename, "wb") as f:
-                    self.pyboy.save_state(f)
-                print(f"🎉 ITEM ACQUIRED! Step {self.step_count}, Address 0x{addr:04X}: {old_val} → {new_val} | Saved: {state_filename}")
+                state_filename = self._save_state_file(f"item_{addr:04X}_{self.state_save_count:03d}_{timestamp}.state",
+                                                       f"item_0x{addr:04X}")
+                saved = f" | Saved: {state_filename}" if state_filename else ""
+                print(f"🎉 ITEM ACQUIRED! Step {self.step_count}, Address 0x{addr:04X}: {old_val} → {new_val}{saved}")
                 self.state_save_count += 1
-                
-            # Update for next check
-            self.previous_flags[addr] = new_val
+
+        if profiler:
+            profiler.add_time(PHASE_ITEM_FLAGS, perf_counter() - start)
         
         return len(new_acquisitions)
+
+    def _save_state_file(self, name, milestone=None):
+        """
+        Write the current emulator state to state_dir/name, delta-encoded against the base state, and
+        catalog it. Returns the path, or None when saving is disabled.
+        """
+        if self.state_dir is None:
+            return None
+        state_filename = os.path.join(self.state_dir, name)
+        profiler = self.profiler
+        if profiler:
+            start = perf_counter()
+        buffer = io.BytesIO()
+        self.pyboy.save_state(buffer)
+        write_state(state_filename, buffer.getvalue(), self.pool.base_state, self.pool.state_path)
+        if self.catalog is not None:
+            fields, flags = read_fields(self.pyboy.memory)
+            self.catalog.add(state_filename, fields, flags, milestone=milestone, run=self.run_id, step=self.step_count)
+        if profiler:
+            profiler.add_time(PHASE_SAVE_STATE, perf_counter() - start)
+            profiler.count(COUNT_STATE_SAVES)
+        return state_filename
     
     def _calculate_reward(self):
         reward = 0.0
-        
-        # Get current state
-        current_x = self.pyboy.memory[0xD500]
-        current_y = self.pyboy.memory[0xD501]
-        current_health = self.pyboy.memory[0xDB5A]
+
+        # Every term below is computed from this snapshot and the previous one
+        self.previous_ram, self.ram = self.ram, self._read_ram()
+        ram = self.ram
+        current_x = int(ram[SNAP_X])
+        current_y = int(ram[SNAP_Y])
+        current_health = int(ram[SNAP_HEALTH])
         
         # Exploration reward - new positions
         position = (current_x, current_y)
@@ -183,27 +502,26 @@ class LinkEnv(gym.Env):
         
         # Big reward for leaving the house (first time only)
         # Log coordinates to understand the house boundaries
-        if not self.left_house and (current_x < 70 or current_x > 90 or current_y < 70 or current_y > 90):
+        if not self.left_house and not self._inside_house(current_x, current_y):
             self.left_house = True
-            self.milestones["left_house"] = self.step_count
+            self._record_milestone("left_house")
             reward += 50.0  # Huge one-time reward for leaving house
             print(f"🏠➡️ LEFT THE HOUSE! Step {self.step_count}, Position: ({current_x}, {current_y}) - One-time +50 reward!")
             
             # Save state when leaving house for analysis
             timestamp = time.strftime("%H%M%S")
-            state_filename = f"roms/training_states/left_house_{current_x}_{current_y}_{timestamp}.state"
-            with open(state_filename, "wb") as f:
-                self.pyboy.save_state(f)
-            print(f"💾 Saved house exit state: {state_filename}")
+            state_filename = self._save_state_file(f"left_house_{current_x}_{current_y}_{timestamp}.state", "left_house")
+            if state_filename:
+                print(f"💾 Saved house exit state: {state_filename}")
         
         # Area/room transition rewards (use only a few key map addresses, not the entire range)
         # Focus on main map ID address instead of entire range
-        main_map_id = self.pyboy.memory[0xD700]  # Main map identifier
+        main_map_id = int(ram[SNAP_MAP_ID])  # Main map identifier
         map_key = f"map_{main_map_id:02X}"
         
         if map_key not in self.discovered_map_values:
             self.discovered_map_values.add(map_key)
-            self.milestones[f"area_{map_key}"] = self.step_count
+            self._record_milestone(f"area_{map_key}")
             reward += 25.0  # Big reward for actual area transitions
             print(f"🗺️ NEW AREA! Step {self.step_count}, Map ID = {main_map_id} | Reward +25")
         
@@ -222,25 +540,22 @@ class LinkEnv(gym.Env):
         reward += item_acquisitions * 10.0  # Big reward for items
         
         # Check shield equipment status (look for specific shield value, not just any value)
-        # Based on Data Crystal: 0xDB44 is shield level, or check for shield item ID in slots
-        shield_value_a = self.pyboy.memory[0xDB00]  # A slot item
-        shield_value_b = self.pyboy.memory[0xDB01]  # B slot item
-        
-        # Shield item ID might be a specific value (need to determine empirically)
-        # For now, let's just track when shield level changes at 0xDB44
-        shield_level = self.pyboy.memory[0xDB44]  # Shield level from Data Crystal
+        # Based on Data Crystal: 0xDB44 is shield level; the A/B slot items (0xDB00/0xDB01) shuffle too often
+        shield_level = int(ram[SNAP_SHIELD_LEVEL])  # Shield level from Data Crystal
         
         # Only track shield level changes, not item slot shuffling
         if hasattr(self, 'previous_shield_level'):
             if shield_level > self.previous_shield_level and not self.shield_equipped:
                 # Shield level increased (got shield)
                 self.shield_equipped = True
-                self.milestones["shield_equipped"] = self.step_count
+                self._record_milestone("shield_equipped")
                 reward += 15.0
                 print(f"🛡️ SHIELD ACQUIRED! Step {self.step_count}, Shield level: {shield_level} | Bonus: +15")
         
         self.previous_shield_level = shield_level
         
+        self._track_episode_milestones(current_x, current_y, main_map_id, shield_level)
+
         # Reduced health loss penalty (was -2.0, now -0.5)
         if self.previous_health is not None and current_health < self.previous_health:
             health_lost = self.previous_health - current_health
@@ -254,5 +569,5 @@ class LinkEnv(gym.Env):
         self.previous_x = current_x
         self.previous_y = current_y
         self.previous_health = current_health
-        
+
         return reward
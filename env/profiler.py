@@ -0,0 +1,52 @@
+# Opt-in per-phase timing for LinkEnv.step
+import numpy as np
+
+# Phase indices (kept as plain ints so the hot path does no lookups)
+PHASE_TICK = 0
+PHASE_OBS = 1
+PHASE_REWARD = 2
+PHASE_ITEM_FLAGS = 3
+PHASE_SAVE_STATE = 4
+PHASE_RESET = 5
+PHASES = ("tick", "obs", "reward", "item_flags", "save_state", "reset")
+
+# Counter indices
+COUNT_STEPS = 0
+COUNT_TICKS = 1
+COUNT_MEMORY_READS = 2
+COUNT_STATE_SAVES = 3
+COUNTERS = ("steps", "ticks", "memory_reads", "state_saves")
+
+
+class StepProfiler:
+    """
+    Accumulates wall-clock time per phase and event counters in preallocated arrays.
+    LinkEnv only creates one when profile=True, so disabled runs pay nothing.
+    """
+
+    def __init__(self):
+        self.phase_seconds = np.zeros(len(PHASES), dtype=np.float64)
+        self.phase_calls = np.zeros(len(PHASES), dtype=np.int64)
+        self.counters = np.zeros(len(COUNTERS), dtype=np.int64)
+
+    def add_time(self, phase, seconds):
+        self.phase_seconds[phase] += seconds
+        self.phase_calls[phase] += 1
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def reset(self):
+        self.phase_seconds[:] = 0.0
+        self.phase_calls[:] = 0
+        self.counters[:] = 0
+
+    def summary(self):
+        """Per-step averages (milliseconds for phases) plus raw totals"""
+        steps = max(int(self.counters[COUNT_STEPS]), 1)
+        summary = {f"{name}_ms": float(self.phase_seconds[i]) * 1000.0 / steps for i, name in enumerate(PHASES)}
+        summary.update({name: int(self.counters[i]) for i, name in enumerate(COUNTERS)})
+        # item_flags/save_state run inside the reward phase, so only top-level phases add up
+        top_level = self.phase_seconds[PHASE_TICK] + self.phase_seconds[PHASE_OBS] + self.phase_seconds[PHASE_REWARD]
+        summary["step_ms"] = float(top_level) * 1000.0 / steps
+        return summary
@@ -0,0 +1,61 @@
+# Known RAM addresses for Link's Awakening DX (Rev 2)
+# Sources: Data Crystal, the LADX disassembly, and our own savestate diffing
+
+# Values used by LinkEnv's reward function
+LINK_X = 0xD500
+LINK_Y = 0xD501
+MAP_ID = 0xD700  # Main map identifier as used by LinkEnv
+HEALTH = 0xDB5A  # Eighths of a heart
+MAX_HEALTH = 0xDB5B  # wMaxHearts, in hearts
+SHIELD_LEVEL = 0xDB44
+SLOT_A = 0xDB00
+SLOT_B = 0xDB01
+
+# Item/progress flag block scanned for 0 -> 1 transitions
+FLAG_START = 0xDB00
+FLAG_END = 0xDBFF
+
+# WRAM window LinkEnv copies once per step; it covers every reward address and the flag block
+SNAPSHOT_START = LINK_X
+SNAPSHOT_END = FLAG_END + 1
+
+# Game flow (LADX disassembly names in comments)
+GAMEPLAY_TYPE = 0xDB95  # wGameplayType
+GAMEPLAY_WORLD = 0x0B  # wGameplayType value while in the overworld/indoors
+DIALOG_STATE = 0xC19F  # wDialogState, non-zero while a text box is open
+DIALOG_STATE_MASK = 0x7F  # Low bits: state; bit 7 is DIALOG_BOX_BOTTOM_FLAG
+DIALOG_CHOICE = 0x0D  # DIALOG_CHOICE: a yes/no (or shop) prompt is waiting for the cursor and A
+ROOM_TRANSITION = 0xC124  # wRoomTransitionState, non-zero while the screen scrolls to the next room
+ROOM = 0xFFF6  # hMapRoom
+IS_INDOOR = 0xDBA5  # wIsIndoor
+
+# Named fields, e.g. for declarative scripts and catalogs
+RAM_FIELDS = {
+    "x": LINK_X,
+    "y": LINK_Y,
+    "map_id": MAP_ID,
+    "health": HEALTH,
+    "shield_level": SHIELD_LEVEL,
+    "slot_a": SLOT_A,
+    "slot_b": SLOT_B,
+    "gameplay_type": GAMEPLAY_TYPE,
+    "dialog_state": DIALOG_STATE,
+    "room_transition": ROOM_TRANSITION,
+    "room": ROOM,
+    "is_indoor": IS_INDOOR,
+}
+
+
+def input_blocked(memory):
+    """True while a text box is open or a room transition is running (input only advances text)"""
+    return memory[DIALOG_STATE] != 0 or memory[ROOM_TRANSITION] != 0
+
+
+def dialog_choice(memory):
+    """True while a text box waits for the player to pick an answer"""
+    return (memory[DIALOG_STATE] & DIALOG_STATE_MASK) == DIALOG_CHOICE
+
+
+def link_controllable(memory):
+    """True when the game is in the world view with no text box open or room transition running"""
+    return memory[GAMEPLAY_TYPE] == GAMEPLAY_WORLD and not input_blocked(memory)
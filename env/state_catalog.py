@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+SQLite catalog of savestates and their key RAM fields
+LinkEnv adds milestone states as it saves them; other states are indexed with
+`python -m env.state_catalog index <paths>`, which parses the files without an emulator. Query with e.g.
+`python -m env.state_catalog query --map-id 0x0A --min-shield 1 --full-health`
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import time
+
+from env import ram_map
+from env.state_file import SaveState, StateFormatError
+from env.state_store import REFERENCE_DIR
+
+CATALOG_PATH = "roms/state_catalog.sqlite"
+
+# Catalog column -> RAM address
+CATALOG_FIELDS = {
+    "map_id": ram_map.MAP_ID,
+    "room": ram_map.ROOM,
+    "x": ram_map.LINK_X,
+    "y": ram_map.LINK_Y,
+    "health": ram_map.HEALTH,
+    "max_health": ram_map.MAX_HEALTH,
+    "shield_level": ram_map.SHIELD_LEVEL,
+    "is_indoor": ram_map.IS_INDOOR,
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS states (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    milestone TEXT,
+    run TEXT,
+    step INTEGER,
+    created REAL,
+    {", ".join(f"{column} INTEGER" for column in CATALOG_FIELDS)},
+    flags BLOB
+);
+CREATE INDEX IF NOT EXISTS states_map ON states (map_id, room);
+CREATE INDEX IF NOT EXISTS states_run ON states (run, step);
+CREATE TABLE IF NOT EXISTS state_flags (
+    state_id INTEGER NOT NULL REFERENCES states (id) ON DELETE CASCADE,
+    addr INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (addr, state_id)
+) WITHOUT ROWID;
+"""
+
+
+def read_fields(memory):
+    """Catalog fields and the raw item-flag block from a PyBoy memory view (or any indexable RAM)"""
+    fields = {column: memory[addr] for column, addr in CATALOG_FIELDS.items()}
+    return fields, bytes(memory[ram_map.FLAG_START:ram_map.FLAG_END + 1])
+
+
+class StateCatalog:
+    """
+    Index of savestate files. Every row holds the state's map, position, health and shield fields,
+    its item-flag block, and the run/step/milestone that produced it. Non-zero flags are also
+    stored one row per (address, state) so flag queries are index lookups.
+    The connection is opened lazily, so a catalog created before forking is safe to share.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Parallel workers write to the same file; wait for their locks instead of failing
+            self._conn = sqlite3.connect(self.path, timeout=30.0)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def add(self, path, fields=None, flags=None, milestone=None, run=None, step=None):
+        """Insert or replace the entry for `path` (fields/flags as returned by read_fields)"""
+        fields = fields or {}
+        columns = ["path", "milestone", "run", "step", "created", *CATALOG_FIELDS, "flags"]
+        values = [os.path.normpath(path), milestone, run, step, time.time(),
+                  *(fields.get(column) for column in CATALOG_FIELDS), flags]
+        with self.conn as conn:
+            conn.execute("DELETE FROM states WHERE path = ?", (values[0],))
+            state_id = conn.execute(
+                f"INSERT INTO states ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values
+            ).lastrowid
+            if flags:
+                conn.executemany(
+                    "INSERT INTO state_flags (state_id, addr, value) VALUES (?, ?, ?)",
+                    [(state_id, ram_map.FLAG_START + i, value) for i, value in enumerate(flags) if value],
+                )
+
+    def remove(self, path):
+        with self.conn as conn:
+            conn.execute("DELETE FROM states WHERE path = ?", (os.path.normpath(path),))
+
+    def paths(self, indexed_only=False):
+        where = " WHERE map_id IS NOT NULL" if indexed_only else ""
+        return {row["path"] for row in self.conn.execute(f"SELECT path FROM states{where}")}
+
+    def query(self, map_id=None, room=None, min_health=None, full_health=False, min_shield=None,
+              flags=(), run=None, milestone=None, limit=None):
+        """
+        States matching every given condition, newest first. `flags` is a list of flag
+        addresses that must be non-zero; `milestone` matches as a SQL LIKE pattern.
+        """
+        conditions, params = [], []
+        for clause, value in (("map_id = ?", map_id), ("room = ?", room), ("health >= ?", min_health),
+                              ("shield_level >= ?", min_shield), ("run = ?", run), ("milestone LIKE ?", milestone)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        if full_health:
+            # Health is stored in eighths of a heart, max health in hearts
+            conditions.append("health >= max_health * 8")
+        for addr in flags:
+            conditions.append("id IN (SELECT state_id FROM state_flags WHERE addr = ?)")
+            params.append(addr)
+
+        sql = "SELECT * FROM states"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY created DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+def index_files(catalog, paths):
+    """Catalog savestate files that have no RAM fields yet, reading RAM straight from the files"""
+    indexed = catalog.paths(indexed_only=True)
+    count = 0
+    for path in paths:
+        if os.path.normpath(path) in indexed:
+            continue
+        try:
+            fields, flags = read_fields(SaveState.open(path))
+        except StateFormatError as e:
+            print(f"❌ Skipping {path}: {e}")
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        catalog.add(path, fields, flags, milestone=name, run="indexed")
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query savestates by RAM contents")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Catalog savestate files (default: roms/**/*.state)")
+    index.add_argument("paths", nargs="*")
+
+    query = commands.add_parser("query", help="Find states by RAM fields")
+    query.add_argument("--map-id", type=lambda value: int(value, 0))
+    query.add_argument("--room", type=lambda value: int(value, 0))
+    query.add_argument("--min-health", type=int)
+    query.add_argument("--full-health", action="store_true")
+    query.add_argument("--min-shield", type=int)
+    query.add_argument("--flag", type=lambda value: int(value, 0), action="append", default=[],
+                       help="Flag address that must be non-zero (repeatable)")
+    query.add_argument("--run")
+    query.add_argument("--milestone", help="SQL LIKE pattern, e.g. 'item_%%'")
+    query.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    catalog = StateCatalog(args.catalog)
+    if args.command == "index":
+        # Archived delta references (roms/**/references/<sha256>.state) are not game states of their own
+        paths = args.paths or [path for path in glob.glob("roms/**/*.state", recursive=True)
+                               if os.path.basename(os.path.dirname(path)) != REFERENCE_DIR]
+        print(f"📁 Indexed {index_files(catalog, paths)} new state(s) into {args.catalog}")
+        return
+
+    rows = catalog.query(map_id=args.map_id, room=args.room, min_health=args.min_health,
+                         full_health=args.full_health, min_shield=args.min_shield, flags=args.flag,
+                         run=args.run, milestone=args.milestone, limit=args.limit)
+    for row in rows:
+        print(f"  {row['path']}  map=0x{row['map_id'] or 0:02X} pos=({row['x']}, {row['y']}) "
+              f"health={row['health']}/{(row['max_health'] or 0) * 8} shield={row['shield_level']} "
+              f"run={row['run']} step={row['step']}")
+    print(f"📊 {len(rows)} state(s)")
+
+
+if __name__ == "__main__":
+    main()
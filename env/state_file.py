@@ -0,0 +1,136 @@
+# Read RAM straight out of PyBoy savestate files, without a ROM or an emulator
+import mmap
+
+import numpy as np
+
+from env.state_store import decode_state, is_delta
+
+# Layout of PyBoy's savestate format (pyboy.utils.STATE_VERSION 29), in the order it is written
+SUPPORTED_VERSIONS = (29,)
+HEADER_SIZE = 6  # version, bootrom, key0, key1, double_speed, cgb
+HDMA_SIZE = 5 + 1 + 2 * 2  # CGB only
+CPU_SIZE = 6 + 3 * 2 + 7 + 8
+OAM_DMA_SIZE = 4 + 8
+VIDEO_RAM = 0x2000
+OAM_SIZE = 0xA0
+LCD_REGS_SIZE = 4 + 1 + 2 + 5  # LCDC, BGP, OBP0, OBP1 | STAT | LY, LYC | SCY, SCX, WY, WX, object priority
+LCD_TAIL_SIZE = 144 * 5 + 6 + 3 * 8 + 2  # Scanline parameters, flags, clocks
+LCD_CGB_TAIL_SIZE = 1 + 2 * (4 + 8 * 4 * 2)  # VBK, then BG and OBJ palette index registers + palette memory
+SOUND_HEAD_SIZE = 3 * 8  # Buffer head, samples per frame, cycles per sample; the buffer follows
+TONE_CHANNEL_SIZE = 5 + 2 + 1 + 1 + 6 * 8 + 3
+SOUND_TAIL_SIZE = (
+    1 + 3 * 8 + 2 * 8 + 2 * 8 + 3 + 8 + 1  # APU registers and timers
+    + TONE_CHANNEL_SIZE + 3 + 4 * 8 + 2 + 8  # Sweep channel
+    + TONE_CHANNEL_SIZE
+    + 16 + 3 + 2 + 1 + 1 + 4 * 8 + 1 + 8 + 2 + 8  # Wave channel
+    + 8 + 1 + 10 * 8 + 1  # Noise channel
+)
+RENDERER_SIZE = 144 * 160 * (4 + 1) + 1
+WRAM_SIZE = 0x2000
+WRAM_SIZE_CGB = 0x8000  # 8 banks of 4 KiB
+NON_IO_SIZE = 0x60  # 0xFEA0-0xFEFF
+IO_SIZE = 0x4C  # 0xFF00-0xFF4B
+HRAM_SIZE = 0x7F  # 0xFF80-0xFFFE
+
+
+class StateFormatError(ValueError):
+    pass
+
+
+class SaveState:
+    """
+    Memory regions of one savestate as read-only numpy views of the file, plus an address-based
+    __getitem__ that mirrors pyboy.memory for WRAM, VRAM, OAM and HRAM. I/O registers are mostly
+    held by PyBoy's timer/LCD/sound objects, so `io` is only the raw backing array.
+    `data` is any buffer (bytes, mmap); plain files opened with open() are memory-mapped.
+    """
+
+    def __init__(self, data):
+        self.raw = np.frombuffer(data, dtype=np.uint8)
+        if len(self.raw) < HEADER_SIZE:
+            raise StateFormatError("File is too short to be a savestate")
+        self.version = int(self.raw[0])
+        if self.version not in SUPPORTED_VERSIONS:
+            raise StateFormatError(f"Unsupported savestate version {self.version}, expected {SUPPORTED_VERSIONS}")
+        self.cgb = bool(self.raw[5])
+
+        offset = HEADER_SIZE + (HDMA_SIZE if self.cgb else 0) + CPU_SIZE + OAM_DMA_SIZE
+        self.vram0 = self._region(offset, VIDEO_RAM)
+        self.oam = self._region(offset + VIDEO_RAM, OAM_SIZE)
+        self.lcd_regs = self._region(offset + VIDEO_RAM + OAM_SIZE, LCD_REGS_SIZE)
+        offset += VIDEO_RAM + OAM_SIZE + LCD_REGS_SIZE + LCD_TAIL_SIZE
+        if self.cgb:
+            self.vram1 = self._region(offset, VIDEO_RAM)
+            self.vram_bank = int(self._region(offset + VIDEO_RAM, 1)[0])
+            offset += VIDEO_RAM + LCD_CGB_TAIL_SIZE
+        else:
+            self.vram1 = None
+            self.vram_bank = 0
+
+        # The audio buffer holds (samples per frame + 1) stereo samples
+        samples_per_frame = int(self._region(offset + 8, 8).view("<u8")[0])
+        offset += SOUND_HEAD_SIZE + (samples_per_frame + 1) * 2 + SOUND_TAIL_SIZE + RENDERER_SIZE
+
+        wram_size = WRAM_SIZE_CGB if self.cgb else WRAM_SIZE
+        self.wram = self._region(offset, wram_size)
+        self.non_io = self._region(offset + wram_size, NON_IO_SIZE)
+        self.io = self._region(offset + wram_size + NON_IO_SIZE, IO_SIZE)
+        self.hram = self._region(offset + wram_size + NON_IO_SIZE + IO_SIZE, HRAM_SIZE)
+        self.wram_select = int(self._region(offset + wram_size + NON_IO_SIZE + IO_SIZE + HRAM_SIZE, 1)[0])
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a plain savestate; delta-encoded ones are decoded into memory first"""
+        with open(path, "rb") as f:
+            if is_delta(f.read(16)):
+                f.seek(0)
+                return cls(decode_state(f.read()))
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _region(self, offset, size):
+        if offset + size > len(self.raw):
+            raise StateFormatError(f"Savestate is truncated at offset {offset} ({len(self.raw)} bytes)")
+        return self.raw[offset:offset + size]
+
+    def _locate(self, bank, addr):
+        """(region, offset) holding `addr`, like PyBoy's memory map"""
+        if 0xC000 <= addr < 0xE000:
+            if addr < 0xD000 or not self.cgb:
+                return self.wram, addr - 0xC000
+            if bank is None:
+                bank = self.wram_select or 1
+            return self.wram, addr - 0xD000 + bank * 0x1000
+        if 0xE000 <= addr < 0xFE00:  # Echo RAM
+            return self._locate(bank, addr - 0x2000)
+        if 0x8000 <= addr < 0xA000:
+            bank = self.vram_bank if bank is None else bank
+            return (self.vram1 if bank and self.cgb else self.vram0), addr - 0x8000
+        if 0xFE00 <= addr < 0xFEA0:
+            return self.oam, addr - 0xFE00
+        if 0xFEA0 <= addr < 0xFF00:
+            return self.non_io, addr - 0xFEA0
+        if 0xFF80 <= addr < 0xFFFF:
+            return self.hram, addr - 0xFF80
+        raise IndexError(f"0x{addr:04X} is not stored as plain memory in savestates")
+
+    def __getitem__(self, key):
+        """memory[addr], memory[start:end] and memory[bank, addr or slice] for WRAM/VRAM banks"""
+        bank = None
+        if isinstance(key, tuple):
+            bank, key = key
+        if isinstance(key, slice):
+            region, start = self._locate(bank, key.start)
+            _, last = self._locate(bank, key.stop - 1)
+            if last - start != key.stop - 1 - key.start:
+                raise IndexError(f"0x{key.start:04X}-0x{key.stop - 1:04X} spans several memory regions")
+            return region[start:last + 1]
+        region, offset = self._locate(bank, key)
+        return int(region[offset])
+
+
+def read_ram(paths, start, end):
+    """Stack memory[start:end] of every savestate in `paths` into one (len(paths), end - start) array"""
+    out = np.empty((len(paths), end - start), dtype=np.uint8)
+    for i, path in enumerate(paths):
+        out[i] = SaveState.open(path)[start:end]
+    return out
@@ -0,0 +1,151 @@
+# Delta-compressed savestate files
+import hashlib
+import io
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from env.emulator_pool import BASE_STATE_PATH
+
+# Header: magic, sha256 of the reference state, decoded length, reference path length; then the
+# UTF-8 reference path and the zlib-compressed XOR of the state against the (zero-padded) reference
+DELTA_MAGIC = b"LADELTA1"
+DELTA_HEADER = struct.Struct("<8s32sIH")
+COMPRESS_LEVEL = 1  # Fast; the XOR delta is mostly zeros either way
+# Write-once copies of every reference a delta was encoded against, named by sha256, in this
+# directory next to the reference file. Regenerating base.state never orphans existing deltas.
+REFERENCE_DIR = "references"
+
+_references = {}  # sha256 digest -> reference bytes
+_references_lock = threading.Lock()
+
+
+class StateStoreError(ValueError):
+    pass
+
+
+def is_delta(blob):
+    return blob[:len(DELTA_MAGIC)] == DELTA_MAGIC
+
+
+def _xor(data, reference):
+    """XOR `data` with `reference`, zero-padded or truncated to len(data)"""
+    out = np.frombuffer(data, dtype=np.uint8).copy()
+    overlap = min(len(data), len(reference))
+    out[:overlap] ^= np.frombuffer(reference, dtype=np.uint8, count=overlap)
+    return out.tobytes()
+
+
+def reference_copy_path(reference_path, digest):
+    """Content-addressed copy of a reference state: <reference dir>/references/<sha256>.state"""
+    return os.path.join(os.path.dirname(os.fspath(reference_path)), REFERENCE_DIR, f"{digest.hex()}.state")
+
+
+def archive_reference(reference, reference_path=BASE_STATE_PATH, digest=None):
+    """Keep a write-once copy of `reference` by content hash; returns its digest"""
+    digest = digest or hashlib.sha256(reference).digest()
+    path = reference_copy_path(reference_path, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(reference)
+        os.replace(tmp, path)
+    with _references_lock:
+        if digest not in _references:
+            _references[digest] = bytes(reference)
+    return digest
+
+
+def encode_state(data, reference, reference_path=BASE_STATE_PATH, digest=None):
+    """Encode raw savestate bytes as a compressed delta against `reference`"""
+    path = os.fspath(reference_path).encode()
+    digest = digest or hashlib.sha256(reference).digest()
+    header = DELTA_HEADER.pack(DELTA_MAGIC, digest, len(data), len(path))
+    return header + path + zlib.compress(_xor(data, reference), COMPRESS_LEVEL)
+
+
+def decode_state(blob, reference=None):
+    """
+    Raw savestate bytes from `blob`. Plain savestates are returned unchanged; deltas are applied
+    to `reference`, or to the reference with the digest in their header (cached per process).
+    """
+    if not is_delta(blob):
+        return blob
+    _, digest, length, path_length = DELTA_HEADER.unpack_from(blob)
+    start = DELTA_HEADER.size + path_length
+    if reference is None:
+        reference = find_reference(blob[DELTA_HEADER.size:start].decode(), digest)
+    if hashlib.sha256(reference).digest() != digest:
+        raise StateStoreError("Delta savestate was encoded against a different reference state")
+    data = _xor(zlib.decompress(blob[start:]), reference)
+    if len(data) != length:
+        raise StateStoreError(f"Delta savestate decoded to {len(data)} bytes, expected {length}")
+    return data
+
+
+def load_reference(path):
+    """Raw bytes of the reference state currently at `path`"""
+    with open(path, "rb") as f:
+        return decode_state(f.read())
+
+
+def find_reference(path, digest):
+    """
+    Reference with the given sha256 digest: from the cache, the content-addressed copy next to
+    `path`, or `path` itself if it still holds that content (deltas written before references
+    were archived), in which case the copy is made now
+    """
+    with _references_lock:
+        cached = _references.get(digest)
+    if cached is not None:
+        return cached
+    copy_path = reference_copy_path(path, digest)
+    if os.path.exists(copy_path):
+        with open(copy_path, "rb") as f:
+            data = f.read()
+    elif os.path.exists(path):
+        data = load_reference(path)
+    else:
+        raise StateStoreError(f"Reference state {digest.hex()} not found (looked for {copy_path} and {path})")
+    if hashlib.sha256(data).digest() != digest:
+        raise StateStoreError(f"Delta savestate was encoded against a reference that is no longer at {path} "
+                              f"and has no copy at {copy_path}")
+    archive_reference(data, path, digest)
+    return data
+
+
+def read_state(path, reference=None):
+    """Raw savestate bytes from a plain or delta-encoded file"""
+    with open(path, "rb") as f:
+        return decode_state(f.read(), reference)
+
+
+def open_state(path, reference=None):
+    """File-like object for PyBoy.load_state, whatever the on-disk format"""
+    return io.BytesIO(read_state(path, reference))
+
+
+def write_state(path, data, reference=None, reference_path=BASE_STATE_PATH):
+    """
+    Write raw savestate bytes as a delta against reference_path (its bytes may be passed as
+    `reference`). The reference itself, or any state without an existing reference file, is
+    written plain. The reference is archived by content hash first, so the delta stays readable
+    after reference_path is overwritten.
+    """
+    if os.path.abspath(path) == os.path.abspath(reference_path):
+        reference = None
+    elif reference is None and os.path.exists(reference_path):
+        reference = load_reference(reference_path)
+    if reference is None:
+        payload = data
+    else:
+        digest = archive_reference(reference, reference_path)
+        payload = encode_state(data, reference, reference_path, digest)
+    # Write to a temp file first so readers never see a partial state
+    with open(path + ".tmp", "wb") as f:
+        f.write(payload)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,46 @@
+# Step several LinkEnvs in one process with a thread pool
+import os
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+
+class ThreadedVecEnv(DummyVecEnv):
+    """
+    DummyVecEnv whose step runs every env's step() on a thread pool.
+
+    PyBoy.tick() releases the GIL for its whole frame loop, so while one thread emulates,
+    the others can run their Python-side input, observation and reward code. One process
+    can therefore drive several emulators instead of needing a process per env. Envs
+    must be headless (SDL2 windows are not thread safe).
+    """
+
+    def __init__(self, env_fns, n_threads=None):
+        super().__init__(env_fns)
+        self.n_threads = n_threads or min(self.num_envs, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.n_threads, thread_name_prefix="LinkEnvStep")
+
+    def _step_env(self, env_idx):
+        # Same per-env logic as DummyVecEnv.step_wait; every buffer slot is owned by one thread
+        obs, self.buf_rews[env_idx], terminated, truncated, self.buf_infos[env_idx] = self.envs[env_idx].step(
+            self.actions[env_idx]
+        )
+        self.buf_dones[env_idx] = terminated or truncated
+        self.buf_infos[env_idx]["TimeLimit.truncated"] = truncated and not terminated
+
+        if self.buf_dones[env_idx]:
+            # save final observation where user can get it, then reset
+            self.buf_infos[env_idx]["terminal_observation"] = obs
+            obs, self.reset_infos[env_idx] = self.envs[env_idx].reset()
+        self._save_obs(env_idx, obs)
+
+    def step_wait(self):
+        # list() re-raises the first exception from any worker
+        list(self._executor.map(self._step_env, range(self.num_envs)))
+        return (self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones), deepcopy(self.buf_infos))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        super().close()
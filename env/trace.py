@@ -0,0 +1,134 @@
+# Memory-mapped per-step RAM traces for long training runs
+import os
+import struct
+
+import numpy as np
+
+from env import ram_map
+
+TRACE_MAGIC = b"LATRACE1"
+HEADER_SIZE = 64  # magic, row size, rows written, padding
+FLAG_COUNT = ram_map.FLAG_END - ram_map.FLAG_START + 1
+
+# One fixed-width row per env step (packed, 277 bytes)
+TRACE_DTYPE = np.dtype([
+    ("step", "<u8"),
+    ("episode", "<u4"),
+    ("x", "u1"),
+    ("y", "u1"),
+    ("map_id", "u1"),
+    ("health", "u1"),
+    ("action", "u1"),
+    ("reward", "<f4"),
+    ("flags", "u1", (FLAG_COUNT,)),
+])
+
+
+def _episode_index_path(path):
+    return path + ".episodes"
+
+
+class TraceRecorder:
+    """
+    Appends TRACE_DTYPE rows to a preallocated memory-mapped file, growing it by doubling.
+    Episode start rows are appended to a sidecar "<path>.episodes" file of uint64s.
+    Existing files are never overwritten: a second recorder on the same path raises FileExistsError.
+    """
+
+    def __init__(self, path, capacity=1 << 20):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.rows_written = 0
+        self.episode = 0
+        self._capacity = 0
+        self._file = open(path, "x+b")
+        self._file.write(struct.pack("<8sQQ", TRACE_MAGIC, TRACE_DTYPE.itemsize, 0).ljust(HEADER_SIZE, b"\0"))
+        self._episodes = open(_episode_index_path(path), "xb")
+        self._map(capacity)
+
+    def _map(self, capacity):
+        self._file.truncate(HEADER_SIZE + capacity * TRACE_DTYPE.itemsize)
+        self._rows = np.memmap(self._file, dtype=TRACE_DTYPE, mode="r+", offset=HEADER_SIZE, shape=(capacity,))
+        self._capacity = capacity
+
+    def start_episode(self):
+        if self.rows_written:
+            self.episode += 1
+        self._episodes.write(struct.pack("<Q", self.rows_written))
+
+    def record(self, step, x, y, map_id, health, flags, action, reward):
+        if self.rows_written == self._capacity:
+            self._rows.flush()
+            self._map(self._capacity * 2)
+        row = self._rows[self.rows_written]
+        row["step"] = step
+        row["episode"] = self.episode
+        row["x"] = x
+        row["y"] = y
+        row["map_id"] = map_id
+        row["health"] = health
+        row["action"] = action
+        row["reward"] = reward
+        row["flags"] = flags
+        self.rows_written += 1
+
+    def flush(self):
+        """Make rows written so far visible to readers"""
+        self._rows.flush()
+        self._file.seek(16)
+        self._file.write(struct.pack("<Q", self.rows_written))
+        self._file.flush()
+        self._episodes.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        del self._rows
+        # Drop the unused preallocated tail
+        self._file.truncate(HEADER_SIZE + self.rows_written * TRACE_DTYPE.itemsize)
+        self._file.close()
+        self._episodes.close()
+
+
+class TraceReader:
+    """Read-only numpy views over a trace file; slicing returns TRACE_DTYPE arrays without parsing"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, row_size, rows = struct.unpack("<8sQQ", f.read(24))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a RAM trace file")
+        if row_size != TRACE_DTYPE.itemsize:
+            raise ValueError(f"{path} has {row_size}-byte rows, expected {TRACE_DTYPE.itemsize}")
+        self.rows = np.memmap(path, dtype=TRACE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(rows,)) if rows else \
+            np.empty(0, dtype=TRACE_DTYPE)
+
+        index_path = _episode_index_path(path)
+        starts = np.fromfile(index_path, dtype="<u8") if os.path.exists(index_path) else np.zeros(1, dtype="<u8")
+        self.episode_starts = starts[starts < max(rows, 1)].astype(np.int64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, key):
+        return self.rows[key]
+
+    def field(self, name, start=0, stop=None):
+        return self.rows[name][start:stop]
+
+    def episode_bounds(self):
+        """(start, stop) row ranges, one per episode"""
+        stops = np.append(self.episode_starts[1:], len(self.rows))
+        return np.stack([self.episode_starts, stops], axis=1)
+
+    def episode(self, i):
+        start, stop = self.episode_bounds()[i]
+        return self.rows[start:stop]
+
+    def iter_chunks(self, chunk_rows=1 << 20, fields=None):
+        """Yield consecutive row slices (optionally only some fields) for streaming analysis"""
+        for start in range(0, len(self.rows), chunk_rows):
+            chunk = self.rows[start:start + chunk_rows]
+            yield chunk[fields] if fields else chunk
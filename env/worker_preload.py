@@ -0,0 +1,21 @@
+"""
+Preloaded by the forkserver that SubprocVecEnv workers fork from (see emulator_pool.worker_start_method).
+Everything done here happens once per machine instead of once per worker, and the resulting
+pages are shared copy-on-write: module imports (including SB3's worker loop, which pulls in torch),
+the ROM and base state, the cached delta-state reference and one booted emulator for the first env.
+"""
+
+import os
+
+import stable_baselines3.common.vec_env.subproc_vec_env  # noqa: F401
+
+import env.link_env  # noqa: F401
+from env.emulator_pool import get_pool
+from env.state_store import archive_reference
+
+# An exception here would take the forkserver down, so missing files are left to the workers to report
+_pool = get_pool()
+if os.path.exists(_pool.rom_path) and os.path.exists(_pool.state_path):
+    _pool.preload()
+    archive_reference(_pool.base_state, _pool.state_path)
+    _pool.prewarm(1)
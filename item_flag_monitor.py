@@ -8,9 +8,12 @@ from pyboy import PyBoy
 import threading
 import time
 import os
+import sys
+
+from utils.command_server import CommandServer, CommandTarget, pyboy_commands, server_port
 
 class ItemFlagMonitor:
-    def __init__(self, pyboy_instance=None):
+    def __init__(self, pyboy_instance=None, server_port=None):
         self.rom_path = "roms/LinksAwakeningDX-Rev2.gbc"
         self.pyboy = pyboy_instance  # Use external instance if provided
         self.running = True
@@ -24,6 +27,11 @@ class ItemFlagMonitor:
         # Store previous flag states
         self.previous_flags = {}
         self.discovered_items = {}
+
+        # Commands (terminal or socket) are applied between frames in run(); created in setup_emulator()
+        self.server_port = server_port
+        self.commands = None
+        self.server = None
         
     def setup_emulator(self):
         """Setup PyBoy with a base state (only if we own the instance)"""
@@ -41,6 +49,17 @@ class ItemFlagMonitor:
         
         # Initialize previous flags regardless of PyBoy source
         self.update_flag_baseline()
+
+        self.commands = CommandTarget("monitor", pyboy_commands(self.pyboy, self, prefix="item_monitor",
+                                                                on_quit=self.stop))
+        if self.server_port is not None:
+            self.server = CommandServer(port=self.server_port)
+            self.server.register(self.commands)
+            self.server.start()
+            print(f"🔌 Command server listening on {self.server.host}:{self.server.port} (target 'monitor')")
+
+    def stop(self):
+        self.running = False
         
     def update_flag_baseline(self):
         """Update the baseline of all flags"""
@@ -79,13 +98,16 @@ class ItemFlagMonitor:
         if acquisitions:
             print(f"📦 Total items discovered: {len(self.discovered_items)}")
     
-    def print_current_flags(self):
-        """Print current non-zero flags for debugging"""
-        non_zero = []
-        for addr in self.flag_range:
-            val = self.pyboy.memory[addr]
-            if val != 0:
-                non_zero.append(f"0x{addr:04X}={val}")
+    def print_current_flags(self, flags=None):
+        """Print current non-zero flags for debugging (flags: {"0xDBxx": value} as returned by the flags command)"""
+        if flags is None:
+            non_zero = []
+            for addr in self.flag_range:
+                val = self.pyboy.memory[addr]
+                if val != 0:
+                    non_zero.append(f"0x{addr:04X}={val}")
+        else:
+            non_zero = [f"{addr}={val}" for addr, val in flags.items()]
         
         if non_zero:
             print(f"🔍 Non-zero flags: {', '.join(non_zero[:10])}" + 
@@ -103,27 +125,27 @@ class ItemFlagMonitor:
             try:
                 cmd = input().strip().lower()
                 
+                # Queued for the emulation thread; call() waits (bounded) until run() has applied it
                 if cmd == 'q':
                     print("Exiting monitor...")
-                    self.running = False
+                    self.commands.call("quit")
                     
                 elif cmd == 'r':
-                    self.update_flag_baseline()
+                    self.commands.call("baseline")
                     print("📊 Baseline reset!")
                     
                 elif cmd == 'f':
-                    self.print_current_flags()
+                    self.print_current_flags(self.commands.call("flags"))
                     
                 elif cmd == 's':
-                    timestamp = time.strftime("%H%M%S")
-                    state_path = f"roms/item_monitor_{timestamp}.state"
-                    with open(state_path, "wb") as f:
-                        self.pyboy.save_state(f)
+                    state_path = self.commands.call("save")
                     print(f"💾 Saved state: {state_path}")
                     
                 else:
                     print("Unknown command. Use 'r', 'f', 's', or 'q'")
                     
+            except TimeoutError as e:
+                print(f"⚠️ {e}")
             except EOFError:
                 break
     
@@ -146,6 +168,7 @@ class ItemFlagMonitor:
             while self.running:
                 self.pyboy.tick()
                 frame_count += 1
+                self.commands.process()
                 
                 # Check for flag changes every 30 frames (half second)
                 if frame_count % 30 == 0:
@@ -158,6 +181,8 @@ class ItemFlagMonitor:
         except KeyboardInterrupt:
             print("\n🛑 Interrupted by user")
         finally:
+            if self.server:
+                self.server.stop()
             # Only stop PyBoy if we own it
             if self.owns_pyboy and self.pyboy:
                 self.pyboy.stop()
@@ -174,7 +199,8 @@ class ItemFlagMonitor:
         print(f"📊 Monitoring {len(self.flag_range)} addresses from 0x{self.FLAG_START:04X} to 0x{self.FLAG_END:04X}")
 
 def main():
-    monitor = ItemFlagMonitor()
+    # --server for the default port, --port N for another one (0 = any free port)
+    monitor = ItemFlagMonitor(server_port=server_port(sys.argv))
     monitor.run()
 
 if __name__ == "__main__":
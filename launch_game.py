@@ -2,11 +2,16 @@ from pyboy import PyBoy
 import threading
 import time
 import os
-from datetime import datetime
 import sys
 
+from utils.command_server import CommandServer, CommandTarget, pyboy_commands, server_port
+
 # Check for monitoring flag
 enable_monitoring = "--monitor" in sys.argv
+# Also accept commands over a local socket (python -m utils.command_server game save):
+# --server uses the default port, --port N another one (0 = any free port)
+port = server_port(sys.argv)
+enable_server = port is not None
 item_monitor = None
 
 if enable_monitoring:
@@ -42,62 +47,69 @@ print("  'q' + Enter = Quit")
 
 # Make sure states directory exists
 os.makedirs("roms", exist_ok=True)
-save_count = 0
 running = True
 
+def stop_running():
+    global running
+    running = False
+
+# Commands from the terminal and the socket server are queued and applied between frames
+commands = CommandTarget("game", pyboy_commands(pyboy, item_monitor, on_quit=stop_running))
+server = None
+if enable_server:
+    server = CommandServer(port=port)
+    server.register(commands)
+    server.start()
+    print(f"🔌 Command server listening on {server.host}:{server.port} (target 'game')")
+    print(f"  python -m utils.command_server --port {server.port} game save|load <name>|flags|quit")
+
+def run_command(command, **args):
+    """Queue a command for the emulation thread and wait (bounded) for its result"""
+    return commands.call(command, **args)
+
 def check_input():
-    global running, save_count
     while running:
         try:
             cmd = input().strip()
             
             if cmd.lower() == 'q':
                 print("Exiting emulator.")
-                running = False
+                run_command("quit")
                 
             elif cmd.lower() == 's':
                 # Auto-incrementing save with timestamp
-                timestamp = datetime.now().strftime("%H%M%S")
-                state_filename = f"roms/save_{save_count:02d}_{timestamp}.state"
-                
-                with open(state_filename, "wb") as f:
-                    pyboy.save_state(f)
-                
-                print(f"✅ Saved state to: {state_filename}")
-                save_count += 1
+                print(f"✅ Saved state to: {run_command('save')}")
                 
             elif cmd.lower().startswith('l '):
-                # Load named state
+                # Load named state (also resets the monitoring baseline)
                 state_name = cmd[2:].strip()
-                state_path = f"roms/{state_name}.state"
-                
                 try:
-                    with open(state_path, "rb") as f:
-                        pyboy.load_state(f)
-                    print(f"✅ Loaded state: {state_path}")
-                    # Reset monitoring baseline after loading state
+                    print(f"✅ Loaded state: {run_command('load', name=state_name)}")
                     if enable_monitoring and item_monitor:
-                        item_monitor.update_flag_baseline()
                         print("📊 Monitoring baseline reset after state load")
                 except FileNotFoundError:
-                    print(f"❌ State not found: {state_path}")
+                    print(f"❌ State not found: roms/{state_name}.state")
+                except ValueError as e:
+                    print(f"❌ {e}")
             
             elif enable_monitoring and cmd.lower() == 'r':
                 # Reset monitoring baseline
                 if item_monitor:
-                    item_monitor.update_flag_baseline()
+                    run_command("baseline")
                     print("📊 Monitoring baseline reset!")
                     
             elif enable_monitoring and cmd.lower() == 'f':
                 # Show current flags
                 if item_monitor:
-                    item_monitor.print_current_flags()
+                    item_monitor.print_current_flags(run_command("flags"))
                     
             else:
                 base_cmds = "Commands: 's' to save, 'l <name>' to load, 'q' to quit"
                 monitor_cmds = ", 'r' to reset baseline, 'f' to show flags" if enable_monitoring else ""
                 print(base_cmds + monitor_cmds)
                 
+        except TimeoutError as e:
+            print(f"⚠️ {e}")
         except EOFError:
             break
 
@@ -109,6 +121,7 @@ try:
     while running:
         pyboy.tick()
         frame_count += 1
+        commands.process()
         
         # Check for item acquisitions if monitoring is enabled
         if enable_monitoring and item_monitor and frame_count % 30 == 0:
@@ -125,4 +138,6 @@ finally:
         print(f"   Total items discovered: {len(item_monitor.discovered_items)}")
         for addr, val in item_monitor.discovered_items.items():
             print(f"   0x{addr:04X} = {val}")
+    if server:
+        server.stop()
     pyboy.stop()
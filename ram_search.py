@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Cheat-engine style value search over RAM dumps
+Loads raw 64 KiB dumps (ram_dumps/ram_*.bin), savestates or live snapshots into one
+(snapshots, 0x10000) array and narrows candidate addresses with chained, vectorized filters.
+
+Example: the value dropped twice, then stayed, then went up by 2
+  python ram_search.py ram_dumps/ram_*.bin --ops "*,dec,dec,same,+2"
+"""
+
+import argparse
+import glob
+import os
+
+import numpy as np
+
+ADDRESS_SPACE = 0x10000
+KINDS = ("u8", "u16", "u16be", "bcd", "bcd16", "bcd16be")
+
+
+def _decode_bcd(raw):
+    """Packed BCD bytes -> (values, valid) where invalid digits (> 9) are flagged"""
+    high, low = raw >> 4, raw & 0x0F
+    return high * 10 + low, (high <= 9) & (low <= 9)
+
+
+class RamSearch:
+    """
+    Candidate addresses over a sequence of memory snapshots.
+    Every filter keeps the candidates whose value (read as `kind`) satisfies a condition between
+    two snapshots, so searches chain like in a cheat engine: filter, snapshot, filter again.
+    Only the remaining candidates are decoded, so later filters cost almost nothing.
+    """
+
+    def __init__(self, snapshots, valid=None):
+        self.snapshots = np.asarray(snapshots, dtype=np.uint8).reshape(-1, ADDRESS_SPACE)
+        # Addresses that hold real data in every snapshot (savestates don't store ROM or I/O)
+        self.candidates = np.flatnonzero(valid) if valid is not None else np.arange(ADDRESS_SPACE)
+
+    @classmethod
+    def from_dumps(cls, paths):
+        """Raw 64 KiB dumps such as ram_dumps/ram_*.bin"""
+        snapshots = np.empty((len(paths), ADDRESS_SPACE), dtype=np.uint8)
+        for i, path in enumerate(paths):
+            snapshots[i] = np.fromfile(path, dtype=np.uint8, count=ADDRESS_SPACE)
+        return cls(snapshots)
+
+    @classmethod
+    def from_states(cls, paths):
+        """Savestate files (plain or delta), parsed without an emulator; only WRAM and HRAM are searched"""
+        from env.state_file import SaveState
+
+        snapshots = np.zeros((len(paths), ADDRESS_SPACE), dtype=np.uint8)
+        for i, path in enumerate(paths):
+            state = SaveState.open(path)
+            snapshots[i, 0xC000:0xE000] = state[0xC000:0xE000]
+            snapshots[i, 0xFF80:0xFFFF] = state[0xFF80:0xFFFF]
+        valid = np.zeros(ADDRESS_SPACE, dtype=bool)
+        valid[0xC000:0xE000] = valid[0xFF80:0xFFFF] = True
+        return cls(snapshots, valid)
+
+    def add_snapshot(self, memory):
+        """Append a live snapshot, e.g. pyboy.memory (read as one 64 KiB slice)"""
+        snapshot = np.asarray(memory[0:ADDRESS_SPACE], dtype=np.uint8)
+        self.snapshots = np.concatenate([self.snapshots, snapshot[None]])
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def values(self, kind="u8", snapshots=None, addresses=None):
+        """(values, valid) of `addresses` (default: candidates) in `snapshots` (default: all), read as `kind`"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown kind {kind!r}, expected one of {KINDS}")
+        addresses = self.candidates if addresses is None else addresses
+        rows = self.snapshots if snapshots is None else self.snapshots[snapshots]
+        wide = kind in ("u16", "u16be", "bcd16", "bcd16be")
+        if wide:
+            # The second byte must exist; a 16-bit value at 0xFFFF is out of range
+            addresses = addresses[addresses < ADDRESS_SPACE - 1]
+        first = rows[..., addresses].astype(np.int32)
+        if not wide:
+            return _decode_bcd(first) if kind == "bcd" else (first, np.ones(first.shape, dtype=bool))
+
+        second = rows[..., addresses + 1].astype(np.int32)
+        low, high = (second, first) if kind.endswith("be") else (first, second)
+        if kind.startswith("bcd"):
+            low, low_valid = _decode_bcd(low)
+            high, high_valid = _decode_bcd(high)
+            return high * 100 + low, low_valid & high_valid
+        return (high << 8) | low, np.ones(first.shape, dtype=bool)
+
+    def filter(self, op, value=None, before=-2, after=-1, kind="u8"):
+        """
+        Keep candidates where the value at snapshot `after` compared to snapshot `before` is:
+        "equals" (== value), "increased", "decreased", "unchanged", "changed", or "changed_by" (delta == value).
+        Returns the number of remaining candidates.
+        """
+        if op == "equals":
+            current, valid = self.values(kind, after)
+            keep = valid & (current == value)
+        else:
+            pair, valid = self.values(kind, [before, after])
+            old, new = pair
+            delta = new - old
+            conditions = {
+                "increased": delta > 0,
+                "decreased": delta < 0,
+                "unchanged": delta == 0,
+                "changed": delta != 0,
+                "changed_by": delta == value,
+            }
+            if op not in conditions:
+                raise ValueError(f"Unknown filter {op!r}")
+            keep = valid.all(axis=0) & conditions[op]
+        self._keep(keep, kind)
+        return len(self.candidates)
+
+    def _keep(self, keep, kind):
+        addresses = self.candidates
+        if kind in ("u16", "u16be", "bcd16", "bcd16be"):
+            addresses = addresses[addresses < ADDRESS_SPACE - 1]
+        self.candidates = addresses[keep]
+
+    def match_sequence(self, ops, kind="u8"):
+        """
+        Apply one op per snapshot in order: ops[i] relates snapshot i to snapshot i - 1.
+        Ops: "*" (anything), "=V", "inc", "dec", "same", "changed", "+N"/"-N" (changed by N).
+        """
+        if len(ops) > len(self.snapshots):
+            raise ValueError(f"{len(ops)} ops for {len(self.snapshots)} snapshots")
+        for i, op in enumerate(ops):
+            op = op.strip()
+            if op == "*":
+                continue
+            if op.startswith("="):
+                self.filter("equals", int(op[1:], 0), after=i, kind=kind)
+                continue
+            if i == 0:
+                raise ValueError(f"The first op can only be '*' or '=V', got {op!r}")
+            named = {"inc": "increased", "dec": "decreased", "same": "unchanged", "changed": "changed"}
+            if op in named:
+                self.filter(named[op], before=i - 1, after=i, kind=kind)
+            else:
+                self.filter("changed_by", int(op, 0), before=i - 1, after=i, kind=kind)
+        return len(self.candidates)
+
+    def report(self, kind="u8", limit=20):
+        """(address, values across all snapshots) for the first `limit` candidates"""
+        addresses = self.candidates[:limit]
+        values, _ = self.values(kind, addresses=addresses)
+        return [(int(addr), values[:, i].tolist()) for i, addr in enumerate(addresses[:values.shape[1]])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Narrow RAM addresses over a sequence of dumps or savestates")
+    parser.add_argument("paths", nargs="*", help="Dumps (.bin) or savestates (.state), in order (default: ram_dumps/ram_*.bin)")
+    parser.add_argument("--ops", required=True, help="Comma-separated op per snapshot, e.g. '=3,dec,same,+2'")
+    parser.add_argument("--kind", default="u8", choices=KINDS)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    # ram_<index>_<timestamp>.bin, ordered by index
+    paths = args.paths or sorted(glob.glob("ram_dumps/ram_*.bin"),
+                                 key=lambda path: int(os.path.basename(path).split("_")[1]))
+    if all(path.endswith(".state") for path in paths):
+        search = RamSearch.from_states(paths)
+    else:
+        search = RamSearch.from_dumps(paths)
+
+    remaining = search.match_sequence(args.ops.split(","), args.kind)
+    print(f"🎯 {remaining} candidate address(es) over {len(paths)} snapshots")
+    for addr, values in search.report(args.kind, args.limit):
+        print(f"  0x{addr:04X}: {' -> '.join(str(value) for value in values)}")
+
+
+if __name__ == "__main__":
+    main()
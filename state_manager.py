@@ -4,14 +4,18 @@ Save state manager - automatically backs up and renames PyBoy save states
 """
 
 import os
-import shutil
 from datetime import datetime
 
+from env.state_catalog import StateCatalog, read_fields
+from env.state_file import SaveState, StateFormatError
+from env.state_store import read_state, write_state
+
 class StateManager:
     def __init__(self):
         self.rom_path = "roms/LinksAwakeningDX-Rev2.gbc"
         self.default_state = "roms/LinksAwakeningDX-Rev2.gbc.state"
         self.backup_dir = "roms/"
+        self.catalog = StateCatalog()
         
     def backup_current_state(self, name):
         """Backup current state with a descriptive name"""
@@ -19,8 +23,18 @@ class StateManager:
             print(f"❌ No current state found at {self.default_state}")
             return False
         
+        # Backups are stored as deltas against base.state; load_state() expands them again
         backup_path = f"{self.backup_dir}{name}.state"
-        shutil.copy2(self.default_state, backup_path)
+        with open(self.default_state, "rb") as f:
+            data = f.read()
+        write_state(backup_path, data, reference_path=f"{self.backup_dir}base.state")
+        # Catalog it with the RAM fields parsed from the state itself, like LinkEnv's milestone saves
+        try:
+            fields, flags = read_fields(SaveState(data))
+        except StateFormatError as e:
+            print(f"⚠️ Cataloged without RAM fields: {e}")
+            fields = flags = None
+        self.catalog.add(backup_path, fields, flags, milestone=name, run="manual")
         print(f"✅ Saved current state as: {backup_path}")
         return True
     
@@ -32,7 +46,9 @@ class StateManager:
             print(f"❌ State not found: {source_path}")
             return False
         
-        shutil.copy2(source_path, self.default_state)
+        # PyBoy reads the default state itself, so it always gets the plain format
+        with open(self.default_state, "wb") as f:
+            f.write(read_state(source_path))
         print(f"✅ Loaded {source_path} as current state")
         return True
     
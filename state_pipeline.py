@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Headless savestate generation from declarative input scripts
+Runs PyBoy unthrottled without a window and waits on RAM conditions instead of fixed frame counts
+
+Script format (JSON):
+{
+  "rom": "roms/LinksAwakeningDX-Rev2.gbc",
+  "states": [
+    {"name": "base", "output": "roms/base.state", "steps": [
+        {"wait": 60},
+        {"press": "start"},
+        {"until": "link_controllable", "mash": "a", "timeout": 6000}
+    ]},
+    {"name": "outside", "from": "base", "steps": [
+        {"hold": "down", "until": {"field": "map_id", "ne": 0}, "timeout": 600}
+    ]}
+  ]
+}
+
+Steps:
+  {"wait": N}                          tick N frames
+  {"press": B, "frames": N}            hold button B for N frames (default 1), then release
+  {"hold": B, "until": C}              hold button B until condition C holds
+  {"until": C, "mash": B, "every": N}  tick until C holds, tapping B every N frames (default 8) if given
+Every "until" step accepts "timeout" (frames, default 3600).
+
+Conditions:
+  "link_controllable"                                    named condition from env.ram_map
+  {"field": "map_id", "eq": 10}                          named RAM field (env.ram_map.RAM_FIELDS)
+  {"addr": "0xDB95", "ne": 0}                            raw address (int or hex string)
+  comparison keys: eq, ne, gt, ge, lt, le, mask (all bits set)
+  {"all": [C, ...]} / {"any": [C, ...]} / {"not": C}
+"""
+
+import io
+import json
+import operator
+import sys
+import time
+
+from env import ram_map
+
+DEFAULT_ROM = "roms/LinksAwakeningDX-Rev2.gbc"
+DEFAULT_TIMEOUT = 3600
+DEFAULT_MASH_EVERY = 8
+
+NAMED_CONDITIONS = {
+    "link_controllable": ram_map.link_controllable,
+}
+
+COMPARISONS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "lt": operator.lt,
+    "le": operator.le,
+    "mask": lambda value, mask: value & mask == mask,
+}
+
+
+class StateScriptError(Exception):
+    """Raised when a script is malformed or a wait condition times out"""
+
+
+def _parse_int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def parse_condition(spec):
+    """Turn a condition spec into a callable taking pyboy.memory"""
+    if isinstance(spec, str):
+        if spec not in NAMED_CONDITIONS:
+            raise StateScriptError(f"Unknown condition {spec!r}, expected one of {sorted(NAMED_CONDITIONS)}")
+        return NAMED_CONDITIONS[spec]
+
+    if "all" in spec:
+        parts = [parse_condition(part) for part in spec["all"]]
+        return lambda memory: all(part(memory) for part in parts)
+    if "any" in spec:
+        parts = [parse_condition(part) for part in spec["any"]]
+        return lambda memory: any(part(memory) for part in parts)
+    if "not" in spec:
+        inner = parse_condition(spec["not"])
+        return lambda memory: not inner(memory)
+
+    if "field" in spec:
+        if spec["field"] not in ram_map.RAM_FIELDS:
+            raise StateScriptError(f"Unknown RAM field {spec['field']!r}")
+        addr = ram_map.RAM_FIELDS[spec["field"]]
+    elif "addr" in spec:
+        addr = _parse_int(spec["addr"])
+    else:
+        raise StateScriptError(f"Condition needs a field or addr: {spec}")
+
+    checks = [(COMPARISONS[key], _parse_int(value)) for key, value in spec.items() if key in COMPARISONS]
+    if not checks:
+        raise StateScriptError(f"Condition has no comparison ({', '.join(COMPARISONS)}): {spec}")
+    return lambda memory: all(compare(memory[addr], value) for compare, value in checks)
+
+
+class ScriptRunner:
+    """Executes input scripts against a headless, unthrottled PyBoy"""
+
+    def __init__(self, rom_path=DEFAULT_ROM):
+        from pyboy import PyBoy
+        from pyboy.utils import WindowEvent
+
+        self.pyboy = PyBoy(rom_path, window="null", cgb=True, sound=False, sound_emulated=False)
+        self.pyboy.set_emulation_speed(0)  # No frame limiter
+        self.power_on_state = self.snapshot()
+        self.frames = 0
+        self.buttons = {
+            "up": (WindowEvent.PRESS_ARROW_UP, WindowEvent.RELEASE_ARROW_UP),
+            "down": (WindowEvent.PRESS_ARROW_DOWN, WindowEvent.RELEASE_ARROW_DOWN),
+            "left": (WindowEvent.PRESS_ARROW_LEFT, WindowEvent.RELEASE_ARROW_LEFT),
+            "right": (WindowEvent.PRESS_ARROW_RIGHT, WindowEvent.RELEASE_ARROW_RIGHT),
+            "a": (WindowEvent.PRESS_BUTTON_A, WindowEvent.RELEASE_BUTTON_A),
+            "b": (WindowEvent.PRESS_BUTTON_B, WindowEvent.RELEASE_BUTTON_B),
+            "start": (WindowEvent.PRESS_BUTTON_START, WindowEvent.RELEASE_BUTTON_START),
+            "select": (WindowEvent.PRESS_BUTTON_SELECT, WindowEvent.RELEASE_BUTTON_SELECT),
+        }
+
+    def snapshot(self):
+        f = io.BytesIO()
+        self.pyboy.save_state(f)
+        return f.getvalue()
+
+    def restore(self, state):
+        self.pyboy.load_state(io.BytesIO(state))
+
+    def _button(self, name):
+        if name not in self.buttons:
+            raise StateScriptError(f"Unknown button {name!r}, expected one of {sorted(self.buttons)}")
+        return self.buttons[name]
+
+    def _tick(self, count=1):
+        # Conditions only read RAM, so intermediate frames are not rendered
+        self.pyboy.tick(count, False)
+        self.frames += count
+
+    def _wait_until(self, step, condition, hold=None, mash=None):
+        timeout = step.get("timeout", DEFAULT_TIMEOUT)
+        every = step.get("every", DEFAULT_MASH_EVERY)
+        memory = self.pyboy.memory
+        if hold:
+            self.pyboy.send_input(hold[0])
+        try:
+            for frame in range(timeout):
+                if condition(memory):
+                    return
+                if mash and frame % every == 0:
+                    self.pyboy.send_input(mash[0])
+                    self._tick()
+                    self.pyboy.send_input(mash[1])
+                else:
+                    self._tick()
+        finally:
+            if hold:
+                self.pyboy.send_input(hold[1])
+        if not condition(memory):
+            raise StateScriptError(f"Timed out after {timeout} frames waiting for {step['until']}")
+
+    def run_step(self, step):
+        if "until" in step:
+            condition = parse_condition(step["until"])
+            hold = self._button(step["hold"]) if "hold" in step else None
+            mash = self._button(step["mash"]) if "mash" in step else None
+            self._wait_until(step, condition, hold=hold, mash=mash)
+        elif "wait" in step:
+            self._tick(step["wait"])
+        elif "press" in step:
+            press, release = self._button(step["press"])
+            self.pyboy.send_input(press)
+            self._tick(step.get("frames", 1))
+            self.pyboy.send_input(release)
+        else:
+            raise StateScriptError(f"Unknown step: {step}")
+
+    def run(self, steps, start_state=None):
+        """Run `steps` from `start_state` (bytes, default power-on) and return the resulting state"""
+        self.restore(start_state if start_state is not None else self.power_on_state)
+        self.frames = 0
+        for step in steps:
+            self.run_step(step)
+        # Render one frame so the saved screen buffer matches the RAM
+        self.pyboy.tick(1, True)
+        self.frames += 1
+        return self.snapshot()
+
+    def stop(self):
+        self.pyboy.stop(save=False)
+
+
+def generate_states(script, only=None):
+    """
+    Produce every state in `script` (a parsed JSON dict) in order, chaining "from" references
+    in memory. Returns {name: output_path} for the states that were written.
+    """
+    runner = ScriptRunner(script.get("rom", DEFAULT_ROM))
+    needed = set(only) | _dependencies(script, only) if only else None
+    generated = {}
+    written = {}
+    try:
+        for entry in script["states"]:
+            name = entry["name"]
+            parent = entry.get("from")
+            if needed is not None and name not in needed:
+                continue
+            if parent is not None and parent not in generated:
+                print(f"❌ {name}: parent state {parent!r} was not generated")
+                continue
+
+            start = time.perf_counter()
+            try:
+                state = runner.run(entry["steps"], generated.get(parent))
+            except StateScriptError as e:
+                print(f"❌ {name}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            generated[name] = state
+
+            output = entry.get("output", f"roms/{name}.state")
+            with open(output, "wb") as f:
+                f.write(state)
+            written[name] = output
+            print(f"✅ {name}: {runner.frames} frames in {elapsed:.2f}s ({runner.frames / elapsed:.0f} fps) -> {output}")
+    finally:
+        runner.stop()
+    return written
+
+
+def _dependencies(script, names):
+    """All ancestors of the requested states, so they are generated first"""
+    parents = {entry["name"]: entry.get("from") for entry in script["states"]}
+    needed = set()
+    for name in names:
+        parent = parents.get(name)
+        while parent is not None and parent not in needed:
+            needed.add(parent)
+            parent = parents.get(parent)
+    return needed
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("🎮 Headless savestate generator")
+        print("\nUsage:")
+        print("  python state_pipeline.py <script.json> [state names...]")
+        print("\nExamples:")
+        print("  python state_pipeline.py state_scripts/intro.json")
+        print("  python state_pipeline.py state_scripts/intro.json base")
+        return
+
+    with open(sys.argv[1]) as f:
+        script = json.load(f)
+    only = set(sys.argv[2:]) or None
+
+    written = generate_states(script, only)
+    print(f"📁 Generated {len(written)} state(s)")
+    targets = only or {entry["name"] for entry in script["states"]}
+    if not targets <= set(written):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,174 @@
-from stable_baselines3 import PPO
+#!/usr/bin/env python3
+"""
+Batched evaluation harness
+Runs K headless episodes in parallel (one LinkEnv per episode), predicts actions for all of them
+with one model.predict call per step, and reports milestone reach rates and steps-to-milestone
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from env.emulator_pool import worker_start_method
 from env.link_env import LinkEnv
-from utils.log_manager import FrameLogger
 
-env = LinkEnv(render=True)
-model = PPO.load("models/ppo_link")
+DEFAULT_START_STATES = ("roms/base.state",)
+# Bumped when a change alters what results mean, so train/sweep_checkpoints.py stops reusing cached ones
+EVAL_VERSION = 2
+
+
+def make_eval_env(obs_mode, max_steps):
+    def _init():
+        # No milestone saves: eval states must not end up in the training curriculum pool or catalog
+        return LinkEnv(render=False, obs_mode=obs_mode, max_steps=max_steps, state_dir=None)
+    return _init
+
+
+def run_wave(model, episodes, obs_mode, max_steps, deterministic, parallel, frame_logger=None):
+    """
+    Run one batch of episodes side by side. `episodes` is a list of (start_state, seed).
+    Every env plays exactly one episode; LinkEnv has no terminal states, so all of them end
+    together at max_steps.
+    """
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+    env_fns = [make_eval_env(obs_mode, max_steps) for _ in episodes]
+    if parallel and len(env_fns) > 1:
+        vec_env = SubprocVecEnv(env_fns, start_method=worker_start_method())
+    else:
+        vec_env = DummyVecEnv(env_fns)
+    try:
+        # Seeds within a wave are consecutive, and VecEnv.seed gives env i base_seed + i
+        vec_env.seed(episodes[0][1])
+        vec_env.set_options([{"start_state": start_state} for start_state, _ in episodes])
+        obs = vec_env.reset()
+
+        n = len(episodes)
+        active = np.ones(n, dtype=bool)
+        returns = np.zeros(n, dtype=np.float64)
+        lengths = np.zeros(n, dtype=np.int64)
+        # Milestones relative to the start state (episode step -> steps-to-milestone); the per-step
+        # "events" are first-ever ones, which a fresh env reports for its start map at step 1
+        reached = [dict() for _ in range(n)]
+
+        for t in range(1, max_steps + 1):
+            actions, _ = model.predict(obs, deterministic=deterministic)
+            obs, rewards, dones, infos = vec_env.step(actions)
+            if frame_logger is not None and active[0]:
+                frame_logger.log_if_different(vec_env.env_method("render", indices=[0])[0])
+
+            for i in np.flatnonzero(active):
+                returns[i] += rewards[i]
+                lengths[i] = t
+                if dones[i]:
+                    reached[i] = infos[i].get("episode_milestones", {})
+                    active[i] = False
+            if not active.any():
+                break
+    finally:
+        vec_env.close()
+
+    return [
+        {"start_state": start_state, "seed": seed, "return": float(returns[i]),
+         "length": int(lengths[i]), "milestones": reached[i]}
+        for i, (start_state, seed) in enumerate(episodes)
+    ]
+
+
+def summarize(results):
+    """Per-milestone reach rate and steps-to-milestone statistics over all episodes"""
+    n = len(results)
+    names = sorted({name for result in results for name in result["milestones"]})
+    milestones = {}
+    for name in names:
+        steps = np.array([result["milestones"][name] for result in results if name in result["milestones"]])
+        milestones[name] = {
+            "reach_rate": len(steps) / n,
+            "steps_mean": float(steps.mean()),
+            "steps_median": float(np.median(steps)),
+            "steps_min": int(steps.min()),
+        }
+    returns = np.array([result["return"] for result in results])
+    return {
+        "episodes": n,
+        "return_mean": float(returns.mean()),
+        "return_std": float(returns.std()),
+        "milestones": milestones,
+    }
+
+
+def evaluate(model, n_episodes=8, start_states=DEFAULT_START_STATES, seed=0, max_steps=2048,
+             n_envs=None, obs_mode="pixels", deterministic=True, parallel=True, log_frames=False):
+    """
+    Evaluate `model` on n_episodes fixed (start_state, seed) pairs: episode i starts from
+    start_states[i % len(start_states)] with seed + i. Episodes run in waves of n_envs.
+    Returns {"summary": ..., "episodes": [...]}.
+    """
+    episodes = [(start_states[i % len(start_states)], seed + i) for i in range(n_episodes)]
+    n_envs = n_envs or n_episodes
+
+    frame_logger = None
+    if log_frames:
+        from utils.log_manager import FrameLogger
+        frame_logger = FrameLogger(diff_threshold=0.05)
+
+    results = []
+    try:
+        for start in range(0, n_episodes, n_envs):
+            results.extend(run_wave(model, episodes[start:start + n_envs], obs_mode, max_steps,
+                                    deterministic, parallel, frame_logger))
+    finally:
+        if frame_logger is not None:
+            frame_logger.close()
+    return {"summary": summarize(results), "episodes": results}
+
+
+def print_summary(summary):
+    print(f"📊 {summary['episodes']} episodes, return {summary['return_mean']:.2f} ± {summary['return_std']:.2f}")
+    for name, stats in summary["milestones"].items():
+        print(f"  {name:<24} reached {stats['reach_rate']:6.1%}  steps median {stats['steps_median']:.0f} "
+              f"(min {stats['steps_min']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a PPO checkpoint on parallel headless episodes")
+    parser.add_argument("model", nargs="?", help="Path to a stable-baselines3 PPO .zip")
+    parser.add_argument("--server", help="Use a running train/inference_server.py (host:port or socket path) "
+                                         "instead of loading the model")
+    parser.add_argument("--authkey", help="Inference server authkey (default: $LINK_INFERENCE_AUTHKEY)")
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--envs", type=int, help="Episodes run side by side (default: all)")
+    parser.add_argument("--max-steps", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-states", nargs="+", default=list(DEFAULT_START_STATES))
+    parser.add_argument("--obs-mode", default="pixels", choices=LinkEnv.OBS_MODES)
+    parser.add_argument("--stochastic", action="store_true", help="Sample actions instead of argmax")
+    parser.add_argument("--log-frames", action="store_true", help="Save changed frames of the first episode")
+    parser.add_argument("--output", help="Write the full JSON report here")
+    args = parser.parse_args()
+
+    if args.server:
+        if args.stochastic:
+            parser.error("--stochastic is set on the inference server (its own --stochastic), not per client")
+        from train.inference_server import InferenceClient, parse_address
 
-logger = FrameLogger(diff_threshold=0.05)
+        model = InferenceClient(parse_address(args.server), authkey=args.authkey)
+    elif args.model:
+        from stable_baselines3 import PPO
 
-obs = env.reset()
-while True:
-    action, _ = model.predict(obs)
-    obs, reward, done, _ = env.step(action)
+        model = PPO.load(args.model, device="cpu")
+    else:
+        parser.error("a model path or --server is required")
+    report = evaluate(model, n_episodes=args.episodes, start_states=args.start_states, seed=args.seed,
+                      max_steps=args.max_steps, n_envs=args.envs, obs_mode=args.obs_mode,
+                      deterministic=not args.stochastic, log_frames=args.log_frames)
+    print_summary(report["summary"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote report to {args.output}")
 
-    logger.log_if_different(obs)
 
-    if done:
-        break
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+IMPALA-style distributed actor-learner training
+Actors run LinkEnv with a copy of the policy and ship compressed trajectory chunks to the learner;
+the learner trains on batches of chunks with V-trace, which corrects for the policy lag between
+the actors' (behaviour) parameters and its own. Transports are pluggable: TCP between machines,
+or an in-process loopback for tests and single-box runs.
+
+  export LINK_IMPALA_AUTHKEY=<shared secret>                # on the learner and every actor host
+  python -m train.impala learner --address 10.0.0.5:6020 --obs-mode tiles
+  python -m train.impala actors --address 10.0.0.5:6020 --actors 8 --obs-mode tiles   # once per actor host
+  python -m train.impala local --actors 4 --obs-mode tiles                            # loopback, one process
+"""
+
+import argparse
+import io
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6020)
+AUTHKEY_ENV = "LINK_IMPALA_AUTHKEY"
+VERSION = struct.Struct("<q")
+CHUNK_ARRAYS = ("obs", "actions", "rewards", "dones", "log_probs", "returns")
+CHUNK_SCALARS = ("version", "actor")
+
+
+def encode_chunk(chunk):
+    """Trajectory chunk (CHUNK_ARRAYS arrays, CHUNK_SCALARS ints) -> compressed .npz bytes"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **{name: np.asarray(chunk[name]) for name in CHUNK_ARRAYS + CHUNK_SCALARS})
+    return zlib.compress(buffer.getvalue(), 1)
+
+
+def decode_chunk(blob):
+    """Inverse of encode_chunk; numeric arrays only, since chunks arrive from the network"""
+    with np.load(io.BytesIO(zlib.decompress(blob)), allow_pickle=False) as arrays:
+        chunk = {name: arrays[name] for name in CHUNK_ARRAYS}
+        chunk.update({name: int(arrays[name]) for name in CHUNK_SCALARS})
+    chunk["returns"] = chunk["returns"].tolist()
+    return chunk
+
+
+# Transports. The learner side has get_chunk()/publish(); the actor side has exchange()/fetch_params().
+# Actors pull parameters: every chunk they send is answered with newer parameters, if there are any.
+
+class LoopbackTransport:
+    """In-process transport for actor threads in the learner's process"""
+
+    def __init__(self, max_chunks=64, stop_event=None):
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._params = None
+        self._published = threading.Condition()
+        # Set when training ends, so actors blocked on a full queue give up their chunk
+        self._stop_event = stop_event
+
+    def get_chunk(self, timeout=None):
+        try:
+            return self._chunks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, version, params):
+        with self._published:
+            self._params = (version, params)
+            self._published.notify_all()
+
+    def fetch_params(self):
+        with self._published:
+            self._published.wait_for(lambda: self._params is not None)
+            return self._params
+
+    def exchange(self, chunk, version):
+        # Blocks while the learner is behind, like a full socket buffer, until the run is stopped
+        while True:
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                break
+            except queue.Full:
+                if self._stop_event is not None and self._stop_event.is_set():
+                    return None
+        params = self._params
+        return params if params is not None and params[0] > version else None
+
+
+class TcpLearnerTransport:
+    """Learner end of the TCP transport: one receiving thread per connected actor"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, max_chunks=256, authkey=None):
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._params = None
+        self._published = threading.Condition()
+        threading.Thread(target=self._accept_loop, name="ImpalaAccept", daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                continue  # Wrong or missing authkey; the listener stays up for everyone else
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="ImpalaActorConn", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                message = conn.recv_bytes()
+                (version,) = VERSION.unpack_from(message)
+                if len(message) > VERSION.size:
+                    self._chunks.put(message[VERSION.size:])
+                    params = self._params
+                else:
+                    # Empty request: block until the first parameters exist
+                    with self._published:
+                        self._published.wait_for(lambda: self._params is not None)
+                        params = self._params
+                if params is not None and params[0] > version:
+                    conn.send_bytes(VERSION.pack(params[0]) + params[1])
+                else:
+                    conn.send_bytes(VERSION.pack(-1))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def get_chunk(self, timeout=None):
+        try:
+            return self._chunks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def publish(self, version, params):
+        with self._published:
+            self._params = (version, params)
+            self._published.notify_all()
+
+    def close(self):
+        self._listener.close()
+
+
+class TcpActorTransport:
+    """Actor end of the TCP transport"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.conn = Client(address, authkey=authkey)
+
+    def _request(self, chunk, version):
+        self.conn.send_bytes(VERSION.pack(version) + chunk)
+        reply = self.conn.recv_bytes()
+        (new_version,) = VERSION.unpack_from(reply)
+        return (new_version, reply[VERSION.size:]) if new_version >= 0 else None
+
+    def fetch_params(self):
+        return self._request(b"", -1)
+
+    def exchange(self, chunk, version):
+        return self._request(chunk, version)
+
+    def close(self):
+        self.conn.close()
+
+
+def make_policy(observation_space, action_space, learning_rate=3e-4):
+    """SB3 actor-critic policy for LinkEnv observations (CNN for pixels, MLP for tiles)"""
+    from stable_baselines3.common.policies import ActorCriticCnnPolicy, ActorCriticPolicy
+    from stable_baselines3.common.preprocessing import is_image_space, is_image_space_channels_first
+    from stable_baselines3.common.vec_env import VecTransposeImage
+
+    if is_image_space(observation_space):
+        # NatureCNN wants channel-first input; obs_to_tensor transposes the env's channel-last frames
+        if not is_image_space_channels_first(observation_space):
+            observation_space = VecTransposeImage.transpose_space(observation_space)
+        return ActorCriticCnnPolicy(observation_space, action_space, lambda _: learning_rate)
+    return ActorCriticPolicy(observation_space, action_space, lambda _: learning_rate)
+
+
+def params_to_bytes(policy):
+    buffer = io.BytesIO()
+    import torch
+    torch.save(policy.state_dict(), buffer)
+    return buffer.getvalue()
+
+
+def load_params(policy, blob):
+    import torch
+    policy.load_state_dict(torch.load(io.BytesIO(blob), map_location="cpu", weights_only=True))
+
+
+def run_actor(transport, env_fn, unroll_length=64, max_chunks=None, actor_id=0, stop_event=None):
+    """
+    Step one env with the latest policy and send chunks of unroll_length transitions.
+    Every chunk carries the behaviour log-probabilities and the parameter version that produced it.
+    """
+    import torch
+
+    env = env_fn()
+    policy = make_policy(env.observation_space, env.action_space)
+    policy.set_training_mode(False)
+    version, blob = transport.fetch_params()
+    load_params(policy, blob)
+
+    obs, _ = env.reset(seed=actor_id)
+    episode_return = 0.0
+    chunks = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            if stop_event is not None and stop_event.is_set():
+                break
+            observations = np.empty((unroll_length + 1, *obs.shape), dtype=obs.dtype)
+            actions = np.empty(unroll_length, dtype=np.int64)
+            rewards = np.empty(unroll_length, dtype=np.float32)
+            dones = np.empty(unroll_length, dtype=np.bool_)
+            log_probs = np.empty(unroll_length, dtype=np.float32)
+            returns = []
+
+            for t in range(unroll_length):
+                observations[t] = obs
+                with torch.no_grad():
+                    obs_tensor, _ = policy.obs_to_tensor(obs)
+                    distribution = policy.get_distribution(obs_tensor)
+                    action = distribution.get_actions()
+                    log_probs[t] = distribution.log_prob(action).item()
+                actions[t] = action.item()
+                obs, rewards[t], terminated, truncated, _ = env.step(int(actions[t]))
+                episode_return += rewards[t]
+                # Truncation is treated as termination; V-trace does not bootstrap across it
+                dones[t] = terminated or truncated
+                if dones[t]:
+                    returns.append(episode_return)
+                    episode_return = 0.0
+                    obs, _ = env.reset()
+            observations[unroll_length] = obs
+
+            chunk = {"obs": observations, "actions": actions, "rewards": rewards, "dones": dones,
+                     "log_probs": log_probs, "version": version, "actor": actor_id, "returns": returns}
+            update = transport.exchange(encode_chunk(chunk), version)
+            if update is not None:
+                version, blob = update
+                load_params(policy, blob)
+            chunks += 1
+    finally:
+        env.close()
+    return chunks
+
+
+def vtrace(behaviour_log_probs, target_log_probs, rewards, values, bootstrap_value, discounts,
+           rho_bar=1.0, c_bar=1.0):
+    """
+    V-trace targets and policy-gradient advantages for (T, B) tensors (Espeholt et al., 2018).
+    discounts is gamma * (1 - done). Returns (vs, pg_advantages), both without gradients.
+    """
+    import torch
+
+    with torch.no_grad():
+        ratios = torch.exp(target_log_probs - behaviour_log_probs)
+        rhos = torch.clamp(ratios, max=rho_bar)
+        cs = torch.clamp(ratios, max=c_bar)
+        next_values = torch.cat([values[1:], bootstrap_value[None]], dim=0)
+        deltas = rhos * (rewards + discounts * next_values - values)
+
+        corrections = torch.zeros_like(values)
+        acc = torch.zeros_like(bootstrap_value)
+        for t in reversed(range(len(values))):
+            acc = deltas[t] + discounts[t] * cs[t] * acc
+            corrections[t] = acc
+        vs = values + corrections
+        next_vs = torch.cat([vs[1:], bootstrap_value[None]], dim=0)
+        pg_advantages = rhos * (rewards + discounts * next_vs - values)
+    return vs, pg_advantages
+
+
+class ImpalaLearner:
+    """Trains the policy on batches of actor chunks and publishes new parameters"""
+
+    def __init__(self, policy, transport, batch_chunks=8, gamma=0.99, vf_coef=0.5, ent_coef=0.01,
+                 max_grad_norm=40.0, rho_bar=1.0, c_bar=1.0, publish_every=1):
+        self.policy = policy
+        self.transport = transport
+        self.batch_chunks = batch_chunks
+        self.gamma = gamma
+        self.vf_coef = vf_coef
+        self.ent_coef = ent_coef
+        self.max_grad_norm = max_grad_norm
+        self.rho_bar = rho_bar
+        self.c_bar = c_bar
+        self.publish_every = publish_every
+
+        self.version = 0
+        self.updates = 0
+        self.frames = 0
+        self.episode_returns = []
+        self.transport.publish(self.version, params_to_bytes(policy))
+
+    def _stack(self, chunks):
+        """Chunks -> (T, B, ...) tensors"""
+        import torch
+
+        policy = self.policy
+        obs = np.stack([chunk["obs"] for chunk in chunks], axis=1)  # (T + 1, B, ...)
+        steps, batch = obs.shape[:2]
+        obs_tensor, _ = policy.obs_to_tensor(obs.reshape(steps * batch, *obs.shape[2:]))
+
+        def field(name, dtype=torch.float32):
+            return torch.as_tensor(np.stack([chunk[name] for chunk in chunks], axis=1), dtype=dtype)
+
+        return obs_tensor, steps, batch, field("actions", torch.int64), field("rewards"), field("dones"), field("log_probs")
+
+    def update(self, chunks):
+        import torch
+
+        obs_tensor, steps, batch, actions, rewards, dones, behaviour_log_probs = self._stack(chunks)
+        unroll = steps - 1
+        self.policy.set_training_mode(True)
+        # One forward pass over every observation, including the bootstrap one at T
+        all_actions = torch.cat([actions, torch.zeros(1, batch, dtype=torch.int64)]).reshape(-1)
+        values, log_probs, entropy = self.policy.evaluate_actions(obs_tensor, all_actions)
+        values = values.reshape(steps, batch)
+        log_probs = log_probs.reshape(steps, batch)[:unroll]
+        entropy = entropy.reshape(steps, batch)[:unroll]
+
+        discounts = self.gamma * (1.0 - dones)
+        vs, pg_advantages = vtrace(behaviour_log_probs, log_probs.detach(), rewards, values[:unroll].detach(),
+                                   values[unroll].detach(), discounts, self.rho_bar, self.c_bar)
+
+        policy_loss = -(pg_advantages * log_probs).mean()
+        value_loss = 0.5 * ((vs - values[:unroll]) ** 2).mean()
+        entropy_loss = -entropy.mean()
+        loss = policy_loss + self.vf_coef * value_loss + self.ent_coef * entropy_loss
+
+        optimizer = self.policy.optimizer
+        optimizer.zero_grad()
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.max_grad_norm)
+        optimizer.step()
+
+        self.updates += 1
+        self.frames += unroll * batch
+        if self.updates % self.publish_every == 0:
+            self.version += 1
+            self.transport.publish(self.version, params_to_bytes(self.policy))
+        return {
+            "loss": loss.detach().item(), "policy_loss": policy_loss.detach().item(),
+            "value_loss": value_loss.detach().item(), "entropy": -entropy_loss.detach().item(),
+            "policy_lag": float(np.mean([self.version - chunk["version"] for chunk in chunks])),
+        }
+
+    def train(self, total_frames, timeout=60.0, log_every=10):
+        """Consume chunks until total_frames transitions have been trained on"""
+        start = time.perf_counter()
+        chunks = []
+        while self.frames < total_frames:
+            blob = self.transport.get_chunk(timeout=timeout)
+            if blob is None:
+                raise TimeoutError(f"No trajectory chunk from any actor for {timeout:.0f}s")
+            try:
+                chunk = decode_chunk(blob)
+            except (ValueError, KeyError, OSError, zlib.error) as e:
+                print(f"⚠️ Dropped a malformed trajectory chunk: {e}")
+                continue
+            self.episode_returns.extend(chunk["returns"])
+            chunks.append(chunk)
+            if len(chunks) < self.batch_chunks:
+                continue
+            stats = self.update(chunks)
+            chunks = []
+            if self.updates % log_every == 0:
+                fps = self.frames / (time.perf_counter() - start)
+                recent = self.episode_returns[-20:]
+                mean_return = f"{np.mean(recent):.2f}" if recent else "n/a"
+                print(f"📊 update {self.updates} | frames {self.frames} ({fps:.0f}/s) | loss {stats['loss']:.3f} "
+                      f"| lag {stats['policy_lag']:.2f} | return {mean_return}")
+        return self.frames
+
+
+def make_link_env(obs_mode, max_steps):
+    from env.link_env import LinkEnv
+
+    def _init():
+        return LinkEnv(render=False, obs_mode=obs_mode, max_steps=max_steps)
+    return _init
+
+
+def _actor_process(address, authkey, obs_mode, max_steps, unroll_length, actor_id):
+    transport = TcpActorTransport(address, authkey)
+    try:
+        run_actor(transport, make_link_env(obs_mode, max_steps), unroll_length, actor_id=actor_id)
+    except (EOFError, OSError):
+        pass  # Learner finished
+    finally:
+        transport.close()
+
+
+def main():
+    from train.inference_server import parse_address, resolve_authkey
+
+    parser = argparse.ArgumentParser(description="IMPALA-style distributed training for LinkEnv")
+    parser.add_argument("mode", choices=["learner", "actors", "local"])
+    parser.add_argument("--address", type=parse_address, default=DEFAULT_ADDRESS, help="host:port of the learner")
+    parser.add_argument("--authkey", help=f"Shared secret between learner and actors (default: ${AUTHKEY_ENV})")
+    parser.add_argument("--actors", type=int, default=4, help="Actor processes (actors) or threads (local)")
+    parser.add_argument("--obs-mode", default="tiles", choices=["pixels", "tiles"])
+    parser.add_argument("--max-steps", type=int, default=2048, help="Episode length")
+    parser.add_argument("--unroll", type=int, default=64, help="Transitions per trajectory chunk")
+    parser.add_argument("--batch-chunks", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=1_000_000, help="Total transitions to train on")
+    parser.add_argument("--lr", type=float, default=3e-4)
+    parser.add_argument("--save", default="impala_linksawakening_policy.pt")
+    args = parser.parse_args()
+
+    if args.mode == "actors":
+        import multiprocessing
+
+        authkey = resolve_authkey(args.authkey, AUTHKEY_ENV)
+        processes = [
+            multiprocessing.Process(target=_actor_process,
+                                    args=(args.address, authkey, args.obs_mode, args.max_steps, args.unroll, i))
+            for i in range(args.actors)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return
+
+    # The learner needs the spaces; one throwaway env provides them
+    probe = make_link_env(args.obs_mode, args.max_steps)()
+    policy = make_policy(probe.observation_space, probe.action_space, args.lr)
+    probe.close()
+
+    stop_event = threading.Event()
+    actors = []
+    if args.mode == "local":
+        transport = LoopbackTransport(stop_event=stop_event)
+        for i in range(args.actors):
+            actor = threading.Thread(target=run_actor, name=f"ImpalaActor{i}", daemon=True,
+                                     args=(transport, make_link_env(args.obs_mode, args.max_steps), args.unroll),
+                                     kwargs={"actor_id": i, "stop_event": stop_event})
+            actor.start()
+            actors.append(actor)
+    else:
+        authkey = resolve_authkey(args.authkey, AUTHKEY_ENV, generate=True)
+        transport = TcpLearnerTransport(args.address, authkey=authkey)
+        print(f"🔌 Learner listening on {transport.address}")
+        if not args.authkey and authkey.decode() != os.environ.get(AUTHKEY_ENV):
+            print(f"🔑 Actors need {AUTHKEY_ENV}={authkey.decode()}")
+
+    learner = ImpalaLearner(policy, transport, batch_chunks=args.batch_chunks)
+    try:
+        learner.train(args.frames, timeout=None if args.mode == "learner" else 60.0)
+    finally:
+        stop_event.set()
+        policy.save(args.save)
+        print(f"✅ Saved policy to {args.save}")
+        # Local actors finish their current chunk and close their envs before the interpreter exits
+        for actor in actors:
+            actor.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Batched policy inference server
+Actor processes send observations over a local socket; the server groups requests from all
+actors into one model.predict call per batch (up to max_batch rows or max_wait_ms after the
+first request) and sends the actions back. InferenceClient.predict mirrors SB3's predict, so a
+client can stand in for the model, e.g. in train/evaluate.py.
+"""
+
+import argparse
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6010)
+AUTHKEY_ENV = "LINK_INFERENCE_AUTHKEY"
+# First byte of every reply
+REPLY_OK = b"\x00"
+REPLY_ERROR = b"\x01"
+
+
+def resolve_authkey(value=None, env_var=AUTHKEY_ENV, generate=False):
+    """
+    Connection authkey from `value` (e.g. --authkey), else from the env_var environment variable.
+    With generate, a random key is made when neither is set; servers print it for their clients.
+    """
+    key = value or os.environ.get(env_var)
+    if key:
+        return key.encode() if isinstance(key, str) else key
+    if generate:
+        return secrets.token_hex(16).encode()
+    raise ValueError(f"No authkey: pass --authkey or set {env_var}")
+
+
+def env_obs_shape(observation_space):
+    """
+    Observation shape as the env produces it. SB3 stores image spaces channel-first (it wraps
+    channel-last envs in VecTransposeImage), while LinkEnv's pixel frames are (144, 160, 3); clients
+    send the env layout and model.predict transposes it back.
+    """
+    from stable_baselines3.common.preprocessing import is_image_space, is_image_space_channels_first
+
+    shape = tuple(observation_space.shape)
+    if is_image_space(observation_space, check_channels=True) and is_image_space_channels_first(observation_space):
+        return shape[1:] + shape[:1]
+    return shape
+
+
+class InferenceServer:
+    """
+    Serves model.predict to any number of local clients.
+    Each connection gets a thread that only moves bytes; a single batching thread owns the model.
+    """
+
+    def __init__(self, model, address=DEFAULT_ADDRESS, max_batch=64, max_wait_ms=2.0, deterministic=True,
+                 authkey=None):
+        self.model = model
+        self.address = address
+        self.authkey = resolve_authkey(authkey, generate=True)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.deterministic = deterministic
+        self.obs_shape = env_obs_shape(model.observation_space)
+        self.obs_dtype = np.dtype(model.observation_space.dtype)
+
+        self.batches = 0
+        self.rows = 0
+        self._requests = queue.SimpleQueue()
+        self._listener = None
+        self._threads = []
+        self._running = False
+
+    def submit(self, obs):
+        """Queue a (n, *obs_shape) batch from any thread; returns a Future of its n actions"""
+        future = Future()
+        self._requests.put((obs, future))
+        return future
+
+    def start(self):
+        self._running = True
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self.address = self._listener.address
+        for target, name in ((self._batch_loop, "InferenceBatcher"), (self._accept_loop, "InferenceAccept")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._running = False
+        self._requests.put(None)
+        if self._listener is not None:
+            self._listener.close()
+
+    def _batch_loop(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._requests.put(None)  # Finish this batch, then stop
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        try:
+            obs = np.concatenate([obs for obs, _ in batch]) if len(batch) > 1 else batch[0][0]
+            actions, _ = self.model.predict(obs, deterministic=self.deterministic)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                # Retry one by one so only the request that broke the batch gets the error
+                for item in batch:
+                    self._run_batch([item])
+            return
+        self.batches += 1
+        self.rows += len(obs)
+        start = 0
+        for request, future in batch:
+            future.set_result(actions[start:start + len(request)])
+            start += len(request)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                continue  # Wrong or missing authkey; the listener stays up for everyone else
+            except OSError:
+                return  # Listener closed
+            conn.send((self.obs_shape, self.obs_dtype.str))
+            thread = threading.Thread(target=self._serve, args=(conn,), name="InferenceConn", daemon=True)
+            thread.start()
+
+    def _read_request(self, data):
+        """Observation bytes -> (n, *obs_shape) array; ValueError if they are not whole observations"""
+        row_bytes = self.obs_dtype.itemsize * int(np.prod(self.obs_shape))
+        if not data or len(data) % row_bytes:
+            raise ValueError(f"Expected a multiple of {row_bytes} bytes ({self.obs_dtype} observations of "
+                             f"shape {self.obs_shape}), got {len(data)}")
+        return np.frombuffer(data, dtype=self.obs_dtype).reshape(-1, *self.obs_shape)
+
+    def _serve(self, conn):
+        """
+        Raw observation bytes in; OK + int64 action bytes, or ERROR + message, out (no pickling on
+        the hot path). A bad request only fails that request; the connection stays open.
+        """
+        try:
+            while True:
+                data = conn.recv_bytes()
+                try:
+                    actions = self.submit(self._read_request(data)).result()
+                    reply = REPLY_OK + np.asarray(actions, dtype=np.int64).tobytes()
+                except Exception as e:
+                    reply = REPLY_ERROR + f"{type(e).__name__}: {e}".encode()
+                conn.send_bytes(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {"batches": self.batches, "rows": self.rows,
+                "mean_batch": self.rows / self.batches if self.batches else 0.0}
+
+
+class InferenceClient:
+    """Connection to an InferenceServer with SB3's predict(obs) -> (actions, None) signature"""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.conn = Client(address, authkey=resolve_authkey(authkey))
+        shape, dtype = self.conn.recv()
+        self.obs_shape = tuple(shape)
+        self.obs_dtype = np.dtype(dtype)
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        # `deterministic` is fixed by the server so that every request in a batch is treated alike
+        obs = np.ascontiguousarray(obs, dtype=self.obs_dtype)
+        single = obs.shape == self.obs_shape
+        if not single and obs.shape[1:] != self.obs_shape:
+            raise ValueError(f"Expected observations of shape {self.obs_shape}, got {obs.shape}")
+        self.conn.send_bytes(obs.tobytes())
+        reply = self.conn.recv_bytes()
+        if reply[:1] != REPLY_OK:
+            raise ValueError(f"Inference server rejected the request: {reply[1:].decode(errors='replace')}")
+        actions = np.frombuffer(reply, dtype=np.int64, offset=1)
+        return (actions[0] if single else actions), None
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_address(value):
+    """'host:port' -> (host, port); anything else is a Unix socket path"""
+    host, sep, port = value.rpartition(":")
+    return (host, int(port)) if sep and port.isdigit() else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve batched predictions from a PPO checkpoint")
+    parser.add_argument("model", help="Path to a stable-baselines3 PPO .zip")
+    parser.add_argument("--address", type=parse_address, default=DEFAULT_ADDRESS,
+                        help="host:port or a Unix socket path (default 127.0.0.1:6010)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--stochastic", action="store_true", help="Sample actions instead of argmax")
+    parser.add_argument("--authkey", help=f"Shared secret for clients (default: ${AUTHKEY_ENV}, else random)")
+    args = parser.parse_args()
+
+    from stable_baselines3 import PPO
+
+    model = PPO.load(args.model, device="cpu")
+    server = InferenceServer(model, args.address, args.max_batch, args.max_wait_ms,
+                             deterministic=not args.stochastic, authkey=args.authkey).start()
+    print(f"🔌 Serving {args.model} on {server.address}")
+    if not (args.authkey or os.environ.get(AUTHKEY_ENV)):
+        print(f"🔑 Clients need {AUTHKEY_ENV}={server.authkey.decode()}")
+    try:
+        while True:
+            time.sleep(10)
+            stats = server.stats()
+            print(f"📊 {stats['batches']} batches, {stats['rows']} rows, mean batch {stats['mean_batch']:.1f}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Checkpoint sweep with cached evaluations
+Evaluates every checkpoint written by CheckpointCallback with the batched harness in train/evaluate.py.
+Results are cached under (checkpoint hash, eval config hash), so reruns only evaluate new checkpoints,
+and the sweep is written out as a learning curve
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+
+from env.link_env import LinkEnv
+from train.evaluate import DEFAULT_START_STATES, EVAL_VERSION, evaluate
+
+CHECKPOINT_STEPS = re.compile(r"_(\d+)_steps\.zip$")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_key(config):
+    """Hash of the eval config, including the contents of the start states it uses"""
+    # Wave size (n_envs) changes how episodes are scheduled, not their results
+    keyed = {key: value for key, value in config.items() if key != "n_envs"}
+    keyed["start_state_hashes"] = [file_sha256(path) for path in config["start_states"]]
+    keyed["eval_version"] = EVAL_VERSION
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+
+def find_checkpoints(checkpoint_dir):
+    """(steps, path) for every checkpoint, ordered by training steps"""
+    checkpoints = []
+    for path in glob.glob(os.path.join(checkpoint_dir, "*.zip")):
+        match = CHECKPOINT_STEPS.search(path)
+        if match:
+            checkpoints.append((int(match.group(1)), path))
+    return sorted(checkpoints)
+
+
+def sweep(checkpoint_dir, cache_dir, config):
+    """Evaluate (or load from cache) every checkpoint; returns learning-curve rows"""
+    from stable_baselines3 import PPO
+
+    os.makedirs(cache_dir, exist_ok=True)
+    config_hash = config_key(config)
+    rows = []
+    for steps, path in find_checkpoints(checkpoint_dir):
+        cache_path = os.path.join(cache_dir, f"{file_sha256(path)[:16]}_{config_hash[:16]}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                summary = json.load(f)["summary"]
+            print(f"📁 {os.path.basename(path)}: cached")
+        else:
+            print(f"⏱️ {os.path.basename(path)}: evaluating {config['n_episodes']} episodes...")
+            model = PPO.load(path, device="cpu")
+            report = evaluate(model, **config)
+            summary = report["summary"]
+            # Write to a temp file first so an interrupted sweep never leaves a partial cache entry
+            with open(cache_path + ".tmp", "w") as f:
+                json.dump({"checkpoint": path, "config": config, **report}, f, indent=2)
+            os.replace(cache_path + ".tmp", cache_path)
+        rows.append({"steps": steps, "checkpoint": path, **summary})
+    return rows
+
+
+def write_curve(rows, out_prefix):
+    """Learning curve as JSON plus a flat CSV with one reach-rate column per milestone"""
+    with open(out_prefix + ".json", "w") as f:
+        json.dump(rows, f, indent=2)
+
+    milestones = sorted({name for row in rows for name in row["milestones"]})
+    with open(out_prefix + ".csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["steps", "checkpoint", "return_mean", "return_std"] + [f"{m}_reach" for m in milestones])
+        for row in rows:
+            reach = [row["milestones"].get(m, {}).get("reach_rate", 0.0) for m in milestones]
+            writer.writerow([row["steps"], row["checkpoint"], row["return_mean"], row["return_std"]] + reach)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate all checkpoints and build a learning curve")
+    parser.add_argument("--checkpoints", default="checkpoints")
+    parser.add_argument("--cache", default="eval_cache")
+    parser.add_argument("--out", default="learning_curve", help="Output prefix for .json/.csv")
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--envs", type=int)
+    parser.add_argument("--max-steps", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-states", nargs="+", default=list(DEFAULT_START_STATES))
+    parser.add_argument("--obs-mode", default="pixels", choices=LinkEnv.OBS_MODES)
+    args = parser.parse_args()
+
+    config = {
+        "n_episodes": args.episodes,
+        "start_states": args.start_states,
+        "seed": args.seed,
+        "max_steps": args.max_steps,
+        "n_envs": args.envs,
+        "obs_mode": args.obs_mode,
+        "deterministic": True,
+    }
+    rows = sweep(args.checkpoints, args.cache, config)
+    if not rows:
+        print(f"❌ No checkpoints found in {args.checkpoints}")
+        return
+    write_curve(rows, args.out)
+    for row in rows:
+        print(f"  {row['steps']:>10} steps  return {row['return_mean']:8.2f}")
+    print(f"✅ Wrote {args.out}.json and {args.out}.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,95 @@
 import os
-import gymnasium as gym
+import importlib.util
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv, VecVideoRecorder
-from stable_baselines3.common.callbacks import CheckpointCallback
-from stable_baselines3.common.evaluation import evaluate_policy
+from stable_baselines3.common.vec_env import DummyVecEnv
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList, CheckpointCallback
 from stable_baselines3.common.monitor import Monitor
+from env.curriculum import StartStateScheduler
 from env.link_env import LinkEnv
 
-def make_env(render=True):
-    env = LinkEnv(render=render)  # Enable/disable visual window
+# "pixels" trains a CNN on the screen, "tiles" trains an MLP on the 18x20 tile grid
+OBS_MODE = "pixels"
+# Record training videos (needs an SDL2 window); the recorder is only imported when enabled
+RECORD_VIDEO = True
+# Sample reset states from base + milestone states, weighted toward the learning frontier
+CURRICULUM = False
+MAX_EPISODE_STEPS = 2_048
+# Decorrelation: start base-state episodes 1..NOOP_MAX idle frames in, and repeat the last action at this rate
+# (off by default, since both change the env dynamics; e.g. 60 and 0.25)
+NOOP_MAX = 0
+STICKY_ACTION_PROB = 0.0
+# Skip text boxes and room transitions inside the env instead of spending policy steps on them
+# (off by default: it changes what a policy step means; choice prompts are always left to the policy)
+AUTO_ADVANCE = False
+# Record per-step RAM traces (position, map, health, flags, action, reward) for offline analysis
+TRACE_PATH = None  # e.g. "traces/link_{pid}_{env}.trace"
+# Index milestone savestates (map, position, health, flags, run/step) for querying with env/state_catalog.py
+STATE_CATALOG = None  # e.g. "roms/state_catalog.sqlite"
+# Final evaluation: episodes run side by side, MAX_EPISODE_STEPS each
+EVAL_EPISODES = 8
+# Collect per-phase step timings from LinkEnv and log them every PROFILE_FREQ steps
+PROFILE = False
+PROFILE_FREQ = 5_000
+
+class ProfilingCallback(BaseCallback):
+    """
+    Logs LinkEnv profiler summaries (info["profile"]) to stdout and TensorBoard, then resets the
+    profilers so every summary covers only the last log_freq steps
+    """
+
+    def __init__(self, log_freq=PROFILE_FREQ, verbose=0):
+        super().__init__(verbose)
+        self.log_freq = log_freq
+
+    def _on_step(self):
+        if self.n_calls % self.log_freq != 0:
+            return True
+
+        summaries = [info["profile"] for info in self.locals.get("infos", []) if "profile" in info]
+        if not summaries:
+            return True
+
+        for key in summaries[0]:
+            mean_value = sum(summary[key] for summary in summaries) / len(summaries)
+            self.logger.record(f"profile/{key}", mean_value)
+
+        summary = summaries[0]
+        phases = ", ".join(f"{key[:-3]}={value:.3f}ms" for key, value in summary.items() if key.endswith("_ms"))
+        print(f"⏱️ Step {self.num_timesteps} | {phases} | ticks={summary['ticks']} "
+              f"reads={summary['memory_reads']} saves={summary['state_saves']}")
+        self.training_env.env_method("reset_profiler")
+        return True
+
+def make_env(render=True, obs_mode=OBS_MODE, profile=PROFILE, curriculum=CURRICULUM):
+    start_states = StartStateScheduler() if curriculum else None
+    max_steps = MAX_EPISODE_STEPS if curriculum else None  # Episodes must end for the scheduler to adapt
+    env = LinkEnv(render=render, obs_mode=obs_mode, profile=profile,
+                  start_states=start_states, max_steps=max_steps, trace_path=TRACE_PATH,
+                  noop_max=NOOP_MAX, sticky_action_prob=STICKY_ACTION_PROB, catalog=STATE_CATALOG,
+                  auto_advance=AUTO_ADVANCE)  # Enable/disable visual window
     env = Monitor(env)
     return env
 
 def main():
-    os.makedirs("videos", exist_ok=True)
     os.makedirs("checkpoints", exist_ok=True)
 
-    # Create environment with video recording (requires render=True)
-    env = DummyVecEnv([lambda: make_env(render=True)])  # Need render=True for video recording
-    env = VecVideoRecorder(env, video_folder="videos", record_video_trigger=lambda x: x % 5_000 == 0,
-                           video_length=2000, name_prefix="ppo_episode")  # More frequent videos, longer clips
+    env = DummyVecEnv([lambda: make_env(render=RECORD_VIDEO)])  # Need render=True for video recording
+    if RECORD_VIDEO:
+        from stable_baselines3.common.vec_env import VecVideoRecorder
+
+        os.makedirs("videos", exist_ok=True)
+        env = VecVideoRecorder(env, video_folder="videos", record_video_trigger=lambda x: x % 5_000 == 0,
+                               video_length=2000, name_prefix="ppo_episode")  # More frequent videos, longer clips
+
+    # TensorBoard logging only when it is installed (SB3 imports it lazily as well)
+    tensorboard_log = "./tensorboard_logs" if importlib.util.find_spec("tensorboard") else None
 
     # Initialize PPO
     model = PPO(
-        "CnnPolicy",
+        "CnnPolicy" if OBS_MODE == "pixels" else "MlpPolicy",
         env,
         verbose=1,
-        tensorboard_log="./tensorboard_logs"
+        tensorboard_log=tensorboard_log
     )
 
     # Save checkpoints
@@ -36,23 +99,26 @@ def main():
         name_prefix="ppo_linksawakening"
     )
 
+    callbacks = [checkpoint_callback]
+    if PROFILE:
+        callbacks.append(ProfilingCallback())
+
     # Train
     model.learn(
         total_timesteps=1_000_000,
-        callback=checkpoint_callback
+        callback=CallbackList(callbacks)
     )
 
     # Save final model
     model.save("ppo_linksawakening_final")
 
-    # Evaluation
-    eval_env = DummyVecEnv([lambda: make_env(render=False)])  # No window for evaluation
-    mean_reward, std_reward = evaluate_policy(model, eval_env, n_eval_episodes=5, render=False)
-    print(f"Evaluation over 5 episodes: mean_reward={mean_reward:.2f} ± {std_reward:.2f}")
-
-    # Close environments
     env.close()
-    eval_env.close()
+
+    # Evaluation: parallel headless episodes from fixed seeds/start states with batched predict
+    from train.evaluate import evaluate, print_summary
+
+    report = evaluate(model, n_episodes=EVAL_EPISODES, max_steps=MAX_EPISODE_STEPS, obs_mode=OBS_MODE)
+    print_summary(report["summary"])
 
 if __name__ == "__main__":
     main()
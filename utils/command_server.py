@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Local asyncio command server for running emulators
+Each emulator registers a CommandTarget and calls target.process() between frames; the server
+(on its own thread and event loop) only queues commands and awaits their results, so a client
+can drive many emulators at once without ever touching PyBoy off its emulation thread.
+
+Protocol: one request per line, either JSON ({"target": "game", "command": "save", "args": {...}})
+or text ("game save" / "game load base" / "* flags"). "*" sends to every target, "list" lists them.
+Every request gets one JSON line back: {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from env import ram_map
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+COMMAND_TIMEOUT = 30.0
+# State names become file names in state_dir: no separators, no leading dot
+STATE_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+class CommandTarget:
+    """Command queue of one emulator; handlers run on whichever thread calls process()"""
+
+    def __init__(self, name, handlers):
+        self.name = name
+        self.handlers = handlers
+        self._queue = queue.SimpleQueue()
+
+    def submit(self, command, args=None):
+        """Queue a command from any thread; returns a Future with the handler's result"""
+        future = Future()
+        if command not in self.handlers:
+            future.set_exception(KeyError(f"Unknown command {command!r} for {self.name}, "
+                                          f"expected one of {sorted(self.handlers)}"))
+        else:
+            self._queue.put((command, args or {}, future))
+        return future
+
+    def call(self, command, timeout=COMMAND_TIMEOUT, **args):
+        """Submit and wait for the result; raises TimeoutError if the emulation thread does not get to it"""
+        future = self.submit(command, args)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Skipped by process() if it has not started yet
+            raise TimeoutError(f"{self.name} did not run {command!r} within {timeout:g}s") from None
+
+    def process(self):
+        """Run every queued command; call between frames on the emulation thread"""
+        while True:
+            try:
+                command, args, future = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.handlers[command](**args))
+            except Exception as e:
+                future.set_exception(e)
+
+
+def state_path(state_dir, name):
+    """Path of the state called `name` in state_dir; names that could escape state_dir are rejected"""
+    if os.path.basename(name) != name or not STATE_NAME.fullmatch(name):
+        raise ValueError(f"Invalid state name {name!r}: use letters, digits, '_', '-' and '.'")
+    return os.path.join(state_dir, f"{name}.state")
+
+
+def pyboy_commands(pyboy, monitor=None, state_dir="roms", prefix="save", on_quit=None):
+    """Standard save/load/baseline/flags/quit handlers for one PyBoy (and optional ItemFlagMonitor)"""
+    from env.state_store import read_state, write_state
+
+    save_count = 0
+
+    def save(name=None):
+        nonlocal save_count
+        if name is None:
+            name = f"{prefix}_{save_count:02d}_{time.strftime('%H%M%S')}"
+            save_count += 1
+        path = state_path(state_dir, name)
+        buffer = io.BytesIO()
+        pyboy.save_state(buffer)
+        write_state(path, buffer.getvalue())
+        return path
+
+    def load(name):
+        path = state_path(state_dir, name)
+        pyboy.load_state(io.BytesIO(read_state(path)))
+        if monitor is not None:
+            monitor.update_flag_baseline()
+        return path
+
+    def baseline():
+        if monitor is None:
+            raise RuntimeError("Item monitoring is not enabled")
+        monitor.update_flag_baseline()
+        return len(monitor.previous_flags)
+
+    def flags():
+        values = pyboy.memory[ram_map.FLAG_START:ram_map.FLAG_END + 1]
+        return {f"0x{ram_map.FLAG_START + i:04X}": value for i, value in enumerate(values) if value}
+
+    def quit():
+        if on_quit is not None:
+            on_quit()
+        return True
+
+    return {"save": save, "load": load, "baseline": baseline, "flags": flags, "quit": quit}
+
+
+def parse_request(line):
+    """(target, command, args) from a JSON or text request line"""
+    line = line.strip()
+    if line.startswith("{"):
+        request = json.loads(line)
+        return request.get("target"), request["command"], request.get("args") or {}
+    words = line.split()
+    if not words:
+        raise ValueError("Empty request")
+    if words[0] == "list":
+        return None, "list", {}
+    if len(words) < 2:
+        raise ValueError("Expected '<target> <command> [arg]'")
+    target, command, rest = words[0], words[1], words[2:]
+    # Text requests take at most one positional argument: the state name for save/load
+    return target, command, ({"name": rest[0]} if rest else {})
+
+
+class CommandServer:
+    """
+    Serves CommandTargets over a local TCP socket from a background event loop.
+    Requests to several targets are awaited concurrently, so a slow emulator never holds up the rest.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=COMMAND_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.targets = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+
+    def register(self, target):
+        self.targets[target.name] = target
+        return target
+
+    def unregister(self, name):
+        self.targets.pop(name, None)
+
+    def start(self):
+        """Start serving on a daemon thread; returns once the socket is listening"""
+        self._thread = threading.Thread(target=self._run, name="CommandServer", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._server is None:
+            raise OSError(f"Could not listen on {self.host}:{self.port}")
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port)
+            )
+            # Port 0 picks a free port
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError:
+            self._server = None
+        self._started.set()
+        if self._server is not None:
+            self._loop.run_forever()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                response = await self._respond(line.decode())
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line):
+        try:
+            target, command, args = parse_request(line)
+            if command == "list":
+                return {"ok": True, "result": sorted(self.targets)}
+            if target == "*":
+                names = sorted(self.targets)
+                results = await asyncio.gather(*(self._call(name, command, args) for name in names),
+                                               return_exceptions=True)
+                return {"ok": True, "result": {
+                    name: {"ok": False, "error": str(result)} if isinstance(result, Exception) else
+                          {"ok": True, "result": result}
+                    for name, result in zip(names, results)
+                }}
+            if target is None and len(self.targets) == 1:
+                target = next(iter(self.targets))
+            return {"ok": True, "result": await self._call(target, command, args)}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    async def _call(self, name, command, args):
+        if name not in self.targets:
+            raise KeyError(f"Unknown target {name!r}, expected one of {sorted(self.targets)}")
+        future = self.targets[name].submit(command, args)
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+
+def server_port(argv):
+    """
+    Command server port from command-line flags: "--port N" (0 = any free port) or "--server"
+    (DEFAULT_PORT); None if neither is given
+    """
+    if "--port" in argv:
+        index = argv.index("--port") + 1
+        if index >= len(argv) or not argv[index].isdigit():
+            raise SystemExit("--port needs a port number (0 for any free port)")
+        return int(argv[index])
+    return DEFAULT_PORT if "--server" in argv else None
+
+
+async def send_command(command, target=None, host=DEFAULT_HOST, port=DEFAULT_PORT, **args):
+    """Send one request and return its decoded response"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(json.dumps({"target": target, "command": command, "args": args}).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a command to running emulators")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("target", help="Target name, '*' for all, or 'list'")
+    parser.add_argument("command", nargs="?")
+    parser.add_argument("name", nargs="?", help="State name for save/load")
+    args = parser.parse_args()
+
+    if args.target == "list":
+        response = asyncio.run(send_command("list", host=args.host, port=args.port))
+    else:
+        extra = {"name": args.name} if args.name else {}
+        response = asyncio.run(send_command(args.command, args.target, args.host, args.port, **extra))
+    print(json.dumps(response, indent=2))
+
+
+if __name__ == "__main__":
+    main()
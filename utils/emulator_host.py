@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Headless host for several emulators behind one command server
+Each emulator runs on its own thread (PyBoy ticks without the GIL) and registers as target
+emu0 .. emu<N-1>, so one client can drive all of them:
+
+  python -m utils.emulator_host --count 4 --port 0
+  python -m utils.command_server --port <printed port> "*" save
+  python -m utils.command_server --port <printed port> emu2 load base
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from env.emulator_pool import BASE_STATE_PATH, ROM_PATH, EmulatorPool
+from utils.command_server import CommandServer, CommandTarget, pyboy_commands
+
+
+class HostedEmulator:
+    """One headless emulator ticking on its own thread and applying its queued commands between frames"""
+
+    def __init__(self, name, pool, state_dir, speed=1):
+        self.name = name
+        self.pyboy = pool.acquire()
+        self.pyboy.set_emulation_speed(speed)
+        self.running = True
+        self.target = CommandTarget(name, pyboy_commands(self.pyboy, state_dir=state_dir, prefix=name,
+                                                         on_quit=self.stop))
+        self.thread = threading.Thread(target=self._run, name=f"Emulator-{name}", daemon=True)
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        try:
+            while self.running:
+                self.pyboy.tick()
+                self.target.process()
+        finally:
+            # Commands that arrived after quit would otherwise wait for their timeout
+            self.target.process()
+            self.pyboy.stop(save=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several headless emulators behind one command server")
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 = any free port (printed on start)")
+    parser.add_argument("--rom", default=ROM_PATH)
+    parser.add_argument("--state", default=BASE_STATE_PATH, help="State every emulator starts from")
+    parser.add_argument("--state-dir", default="roms", help="Where save/load names are resolved")
+    parser.add_argument("--speed", type=int, default=1, help="Emulation speed (0 = unlimited)")
+    args = parser.parse_args()
+
+    os.makedirs(args.state_dir, exist_ok=True)
+    pool = EmulatorPool(args.rom, args.state)
+    server = CommandServer(args.host, args.port)
+    emulators = [HostedEmulator(f"emu{i}", pool, args.state_dir, args.speed) for i in range(args.count)]
+    for emulator in emulators:
+        server.register(emulator.target)
+        emulator.thread.start()
+    server.start()
+    print(f"🔌 {args.count} emulators on {server.host}:{server.port} (targets emu0..emu{args.count - 1})")
+
+    try:
+        while any(emulator.thread.is_alive() for emulator in emulators):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("\nStopping emulators...")
+    finally:
+        for emulator in emulators:
+            emulator.stop()
+        for emulator in emulators:
+            emulator.thread.join()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
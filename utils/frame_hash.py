@@ -0,0 +1,56 @@
+import numpy as np
+
+HASH_GRID = 8  # 8x8 blocks -> 64-bit hash
+HASH_BANDS = 4  # 16-bit bands for multi-index lookup
+
+
+def block_mean_hash(gray):
+    """
+    64-bit perceptual hash of a grayscale frame: the frame is split into an 8x8 grid of blocks
+    and each bit says whether that block's mean is above the median block mean
+    """
+    rows, cols = gray.shape
+    block_h, block_w = rows // HASH_GRID, cols // HASH_GRID
+    blocks = gray[:block_h * HASH_GRID, :block_w * HASH_GRID].reshape(HASH_GRID, block_h, HASH_GRID, block_w)
+    means = blocks.mean(axis=(1, 3))
+    bits = (means > np.median(means)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FrameHashIndex:
+    """
+    Set of 64-bit frame hashes with Hamming-distance lookup.
+    Hashes are split into HASH_BANDS 16-bit bands; two hashes within max_distance < HASH_BANDS
+    bits must agree exactly on at least one band, so only hashes sharing a band are compared.
+    """
+
+    def __init__(self, max_distance=3):
+        if max_distance >= HASH_BANDS:
+            raise ValueError(f"max_distance must be below {HASH_BANDS} for exact band lookup")
+        self.max_distance = max_distance
+        self.hashes = set()
+        self._bands = [{} for _ in range(HASH_BANDS)]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @staticmethod
+    def _band_values(frame_hash):
+        return [(frame_hash >> (16 * band)) & 0xFFFF for band in range(HASH_BANDS)]
+
+    def find_near(self, frame_hash):
+        """Return a stored hash within max_distance bits, or None"""
+        if frame_hash in self.hashes:
+            return frame_hash
+        for band, value in enumerate(self._band_values(frame_hash)):
+            for candidate in self._bands[band].get(value, ()):
+                if (candidate ^ frame_hash).bit_count() <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, frame_hash):
+        if frame_hash in self.hashes:
+            return
+        self.hashes.add(frame_hash)
+        for band, value in enumerate(self._band_values(frame_hash)):
+            self._bands[band].setdefault(value, []).append(frame_hash)
@@ -1,33 +1,166 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from PIL import Image
 import numpy as np
+from utils.frame_hash import FrameHashIndex, block_mean_hash
 
 class FrameLogger:
-    def __init__(self, log_root="temp_frames", diff_threshold=0.05):
+    def __init__(self, log_root="temp_frames", diff_threshold=0.05, downsample=2, workers=2,
+                 archive=False, chunk_size=256, dedup_distance=None, max_pending=None):
         """
         :param diff_threshold: Percent of pixels that must differ to trigger a save (0.05 = 5%)
+        :param downsample: Compare every Nth pixel in each direction (grayscale) instead of the full RGB frame
+        :param workers: Background threads encoding PNGs / archives so the caller never blocks on disk
+        :param archive: Write frames into compressed NPZ chunks of chunk_size frames instead of one PNG each
+        :param dedup_distance: Skip frames whose perceptual hash is within this many bits of any frame saved
+                               earlier in the session (None = only compare against the previous frame)
+        :param max_pending: Writes queued or in progress before the caller blocks (default 4 per worker),
+                            so a slow disk slows the caller down instead of filling memory
         """
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.session_dir = Path(log_root) / f"Session_{timestamp}"
         self.session_dir.mkdir(parents=True, exist_ok=True)
         self.frame_count = 0
-        self.last_frame = None
         self.diff_threshold = diff_threshold
+        self.downsample = downsample
+        self.archive = archive
+        self.chunk_size = chunk_size
+        self.chunk_count = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FrameLogger")
+        self._pending = []
+        self._slots = threading.BoundedSemaphore(max_pending or 4 * workers)
+        self.frame_index = FrameHashIndex(dedup_distance) if dedup_distance is not None else None
+        self.duplicates_skipped = 0
+
+        # Grayscale diff buffers, allocated on the first frame once the shape is known
+        self._last_gray = None
+        self._gray = None
+        self._channel = None
+        self._diff = None
+        self._changed = None
+        # Frames (and their indices) waiting to be written to the current archive chunk
+        self._chunk_frames = None
+        self._chunk_indices = None
+        self._chunk_fill = 0
 
     def log_if_different(self, current_frame_np):
-        if self.last_frame is None:
-            self._save_frame(current_frame_np)
-        else:
-            # Compare pixel-wise absolute difference
-            diff = np.abs(current_frame_np.astype(np.int16) - self.last_frame.astype(np.int16))
-            percent_changed = np.mean(diff > 10)  # Threshold: per-pixel RGB intensity change >10
-            if percent_changed > self.diff_threshold:
+        if self._last_gray is None:
+            self._allocate(current_frame_np)
+            self._to_gray(current_frame_np, self._last_gray)
+            if not self._is_duplicate(self._last_gray):
+                self._save_frame(current_frame_np)
+            return
+
+        self._to_gray(current_frame_np, self._gray)
+        # uint16 wraparound reinterpreted as int16 gives the signed difference (|diff| <= 255)
+        np.subtract(self._gray, self._last_gray, out=self._diff, casting="unsafe")
+        np.abs(self._diff, out=self._diff)
+        np.greater(self._diff, 10, out=self._changed)  # Threshold: per-pixel intensity change >10
+        percent_changed = np.count_nonzero(self._changed) / self._changed.size
+        if percent_changed > self.diff_threshold:
+            self._gray, self._last_gray = self._last_gray, self._gray
+            if not self._is_duplicate(self._last_gray):
                 self._save_frame(current_frame_np)
 
+    def _is_duplicate(self, gray):
+        """Check the session-wide hash index; remember the frame if it is new"""
+        if self.frame_index is None:
+            return False
+        frame_hash = block_mean_hash(gray)
+        if self.frame_index.find_near(frame_hash) is not None:
+            self.duplicates_skipped += 1
+            return True
+        self.frame_index.add(frame_hash)
+        return False
+
+    def _allocate(self, frame):
+        shape = frame[::self.downsample, ::self.downsample, 0].shape
+        self._last_gray = np.empty(shape, dtype=np.uint16)
+        self._gray = np.empty(shape, dtype=np.uint16)
+        self._channel = np.empty(shape, dtype=np.uint16)
+        self._diff = np.empty(shape, dtype=np.int16)
+        self._changed = np.empty(shape, dtype=bool)
+
+    def _to_gray(self, frame, out):
+        """Integer luma ((77R + 150G + 29B) >> 8) of the downsampled frame, written into `out`"""
+        small = frame[::self.downsample, ::self.downsample]
+        np.copyto(out, small[..., 0])
+        out *= 77
+        np.copyto(self._channel, small[..., 1])
+        self._channel *= 150
+        out += self._channel
+        np.copyto(self._channel, small[..., 2])
+        self._channel *= 29
+        out += self._channel
+        out >>= 8
+
     def _save_frame(self, frame):
-        filename = self.session_dir / f"frame_{self.frame_count:06d}.png"
-        Image.fromarray(frame).save(filename)
-        self.last_frame = frame
+        frame = frame[..., :3]
+        if self.archive:
+            self._add_to_chunk(frame)
+        else:
+            filename = self.session_dir / f"frame_{self.frame_count:06d}.png"
+            # Copy so the caller can reuse its buffer while the worker encodes
+            self._submit(Image.fromarray(np.array(frame)).save, filename)
         self.frame_count += 1
+
+    def _add_to_chunk(self, frame):
+        if self._chunk_frames is None:
+            self._chunk_frames = np.empty((self.chunk_size,) + frame.shape, dtype=frame.dtype)
+            self._chunk_indices = np.empty(self.chunk_size, dtype=np.int64)
+        self._chunk_frames[self._chunk_fill] = frame
+        self._chunk_indices[self._chunk_fill] = self.frame_count
+        self._chunk_fill += 1
+        if self._chunk_fill == self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if not self._chunk_fill:
+            return
+        filename = self.session_dir / f"frames_{self.chunk_count:04d}.npz"
+        frames = self._chunk_frames[:self._chunk_fill].copy()
+        indices = self._chunk_indices[:self._chunk_fill].copy()
+        self._submit(np.savez_compressed, filename, frames=frames, indices=indices)
+        self.chunk_count += 1
+        self._chunk_fill = 0
+
+    def _submit(self, fn, *args, **kwargs):
+        pending, error = [], None
+        for future in self._pending:
+            if not future.done():
+                pending.append(future)
+            elif error is None:
+                error = future.exception()
+        self._pending = pending
+        if error is not None:
+            # A failed write (disk full, permissions) surfaces on the caller instead of vanishing
+            raise error
+        self._slots.acquire()  # Backpressure: wait for a free slot
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append(future)
+
+    def flush(self):
+        """Write any partial archive chunk and wait for all queued writes"""
+        if self.archive:
+            self._flush_chunk()
+        for future in self._pending:
+            future.result()
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()